@@ -0,0 +1,97 @@
+"""
+Vercel serverless function for batch searches (several keywords x several locations)
+Returns one merged, de-duplicated lead list
+"""
+import json
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import DEFAULT_BATCH_CONCURRENCY, resolve_locations, run_batch_search
+from deadline import RESPONSE_MARGIN, Deadline
+from memory import MemoryProfiler
+from metrics import Metrics
+
+def handler(request):
+    """Vercel serverless function handler"""
+    try:
+        # Parse request body - Vercel Python runtime provides request as dict
+        if isinstance(request, dict):
+            body = request.get('body', '{}')
+            if isinstance(body, str):
+                data = json.loads(body)
+            else:
+                data = body
+        else:
+            # Fallback for other formats
+            body = getattr(request, 'body', b'{}')
+            if isinstance(body, bytes):
+                data = json.loads(body.decode('utf-8'))
+            else:
+                data = json.loads(body) if isinstance(body, str) else body
+
+        # Extract parameters - `locations` entries are strings or {location, latitude, longitude}
+        keywords = [k for k in data.get('keywords', []) if k and k.strip()]
+        locations = data.get('locations', [])
+        if not keywords or not locations:
+            raise ValueError("At least one keyword and one location are required")
+        zoom_level = int(data.get('zoom_level', 13))
+        max_results = int(data.get('max_results', 5))
+        reviews_threshold = int(data.get('reviews_threshold', 15))
+        vetting_threshold = int(data.get('vetting_threshold', 50))
+        max_concurrent = int(data.get('max_concurrent', DEFAULT_BATCH_CONCURRENCY))
+        include_timings = bool(data.get('include_timings', False))
+        include_memory = bool(data.get('include_memory', False))
+        vetting_mode = data.get('vetting_mode')
+        time_limit = data.get('deadline', os.getenv('LEADSTOOL_SCRAPE_DEADLINE'))
+
+        metrics = Metrics()
+        deadline = Deadline(max(0.0, float(time_limit) - RESPONSE_MARGIN)) if time_limit else None
+
+        resolved, failed = resolve_locations(locations, metrics)
+        with MemoryProfiler(trace=include_memory) as memory:
+            results = run_batch_search(
+                keywords,
+                resolved,
+                max_results,
+                reviews_threshold,
+                vetting_threshold,
+                zoom_level=zoom_level,
+                max_concurrent=max_concurrent,
+                metrics=metrics,
+                deadline=deadline,
+                vetting_mode=vetting_mode
+            )
+
+        response_body = {'success': True, 'data': results, 'failed_locations': failed}
+        if deadline:
+            response_body['partial'] = deadline.partial
+            response_body['unprocessed'] = deadline.unprocessed
+        if include_timings:
+            response_body['timings'] = metrics.summary()
+        if include_memory:
+            response_body['memory'] = memory.summary()
+
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps(response_body)
+        }
+
+    except Exception as e:
+        import traceback
+        error_msg = str(e)
+        traceback.print_exc()
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'success': False, 'error': error_msg})
+        }
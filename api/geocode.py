@@ -0,0 +1,68 @@
+"""
+Vercel serverless function for geocoding a location string
+Uses the shared cached, rate-limited geocoder instead of calling Nominatim from the browser
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geocode import geocode
+
+def handler(request):
+    """Vercel serverless function handler"""
+    try:
+        # Parse request body - Vercel Python runtime provides request as dict
+        if isinstance(request, dict):
+            body = request.get('body', '{}')
+            if isinstance(body, str):
+                data = json.loads(body)
+            else:
+                data = body
+        else:
+            # Fallback for other formats
+            body = getattr(request, 'body', b'{}')
+            if isinstance(body, bytes):
+                data = json.loads(body.decode('utf-8'))
+            else:
+                data = json.loads(body) if isinstance(body, str) else body
+        
+        location = data.get('location', '')
+        if not location:
+            raise ValueError("Location is required")
+        
+        result = geocode(location)
+        if not result:
+            return {
+                'statusCode': 404,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({'success': False, 'error': 'Location not found'})
+            }
+        
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({
+                'success': True,
+                'lat': result['lat'],
+                'lon': result['lon'],
+                'address': result['address']
+            })
+        }
+        
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'success': False, 'error': str(e)})
+        }
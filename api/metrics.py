@@ -0,0 +1,58 @@
+"""
+Vercel serverless function exposing aggregated scraper metrics
+Returns JSON by default, or Prometheus text with {"format": "prometheus"}
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import global_metrics
+
+def handler(request):
+    """Vercel serverless function handler"""
+    try:
+        # Parse request body - Vercel Python runtime provides request as dict
+        if isinstance(request, dict):
+            body = request.get('body') or '{}'
+            if isinstance(body, str):
+                data = json.loads(body)
+            else:
+                data = body
+        else:
+            # Fallback for other formats
+            body = getattr(request, 'body', None) or b'{}'
+            if isinstance(body, bytes):
+                data = json.loads(body.decode('utf-8'))
+            else:
+                data = json.loads(body) if isinstance(body, str) else body
+        
+        if data.get('format') == 'prometheus':
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'text/plain; version=0.0.4',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': global_metrics.to_prometheus()
+            }
+        
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'success': True, 'metrics': global_metrics.summary()})
+        }
+        
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'success': False, 'error': str(e)})
+        }
@@ -9,7 +9,12 @@ import sys
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import run_google_maps_scraper, VettingEngine
+from core import run_google_maps_scraper, VettingEngine
+from async_engine import run_async_scraper
+from compact import encode_columns, json_response, request_header
+from deadline import RESPONSE_MARGIN, Deadline
+from memory import MemoryProfiler
+from metrics import Metrics
 
 def handler(request):
     """Vercel serverless function handler"""
@@ -38,7 +43,14 @@ def handler(request):
         max_results = int(data.get('max_results', 5))
         reviews_threshold = int(data.get('reviews_threshold', 15))
         vetting_threshold = int(data.get('vetting_threshold', 50))
-        use_scraper_api = data.get('use_scraper_api', False)
+        include_timings = bool(data.get('include_timings', False))
+        include_memory = bool(data.get('include_memory', False))
+        engine = data.get('engine', 'sync')
+        vetting_mode = data.get('vetting_mode')
+        # "compact" = columnar leads, compressed according to Accept-Encoding
+        response_format = data.get('format', 'rows')
+        # Seconds this function may run (the platform's limit); partial results are returned before it
+        time_limit = data.get('deadline', os.getenv('LEADSTOOL_SCRAPE_DEADLINE'))
         
         # Create mock progress objects
         class MockProgress:
@@ -52,23 +64,42 @@ def handler(request):
         progress_bar = MockProgress()
         status_text = MockStatus()
         
-        api_key = os.getenv('SCRAPER_API_KEY', '') if use_scraper_api else None
+        metrics = Metrics()
+        deadline = Deadline(max(0.0, float(time_limit) - RESPONSE_MARGIN)) if time_limit else None
         
-        # Run scraper
-        results = run_google_maps_scraper(
-            keyword,
-            location_input,
-            latitude,
-            longitude,
-            zoom_level,
-            max_results,
-            progress_bar,
-            status_text,
-            reviews_threshold,
-            vetting_threshold,
-            use_scraper_api=use_scraper_api,
-            api_key=api_key
-        )
+        # Run scraper - "async" uses the asyncio engine for high fan-out
+        scraper = run_async_scraper if engine == 'async' else run_google_maps_scraper
+        with MemoryProfiler(trace=include_memory) as memory:
+            results = scraper(
+                keyword,
+                location_input,
+                latitude,
+                longitude,
+                zoom_level,
+                max_results,
+                progress_bar,
+                status_text,
+                reviews_threshold,
+                vetting_threshold,
+                metrics=metrics,
+                vetting_mode=vetting_mode,
+                deadline=deadline
+            )
+        
+        response_body = {'success': True, 'data': results}
+        if response_format == 'compact':
+            response_body['format'] = 'columnar'
+            response_body['data'] = encode_columns(results)
+        if deadline:
+            response_body['partial'] = deadline.partial
+            response_body['unprocessed'] = deadline.unprocessed
+        if include_timings:
+            response_body['timings'] = metrics.summary()
+        if include_memory:
+            response_body['memory'] = memory.summary()
+        
+        if response_format == 'compact':
+            return json_response(response_body, request_header(request, 'Accept-Encoding'))
         
         return {
             'statusCode': 200,
@@ -76,7 +107,7 @@ def handler(request):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({'success': True, 'data': results})
+            'body': json.dumps(response_body)
         }
         
     except Exception as e:
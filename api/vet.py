@@ -7,7 +7,7 @@ import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import VettingEngine
+from core import VettingEngine
 
 def handler(request):
     """Vercel serverless function handler"""
@@ -32,7 +32,7 @@ def handler(request):
             raise ValueError("URL is required")
         
         vetter = VettingEngine()
-        score, details, budget = vetter.analyze_site(url)
+        score, details, budget, rules_version = vetter.vet_site(url)
         
         return {
             'statusCode': 200,
@@ -44,7 +44,8 @@ def handler(request):
                 'success': True,
                 'score': score,
                 'details': details,
-                'budget': budget
+                'budget': budget,
+                'rules_version': rules_version
             })
         }
         
@@ -2,19 +2,26 @@ import streamlit as st
 import pandas as pd
 from playwright.sync_api import sync_playwright
 from playwright_stealth import stealth_sync
-from bs4 import BeautifulSoup
 import time
 import random
-import re
 import os
 import sys
+import json
 import asyncio
 
 # Fix for Windows Event Loop Policy
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
-from geopy.geocoders import Nominatim
+from async_engine import run_async_scraper
+from cache import get_ttl_cache
+from core import VettingEngine, lead_pipeline, reclassify_lead
+from geocode import geocode, normalize_query
+from memory import MemoryProfiler
+from metrics import Metrics, global_metrics
+from parse_pool import get_parse_executor
+from pipeline import DEFAULT_QUEUE_SIZE
+from rules import current_rules
 
 # --- CONFIGURATION & HELPERS ---
 
@@ -34,75 +41,38 @@ def human_scroll(page, scroll_box_selector, scrolls=3):
     except:
         pass
 
-# --- VETTING ENGINE ---
-
-class VettingEngine:
-    def __init__(self):
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-
-    def analyze_site(self, url):
-        """Analyzes website for wealth markers"""
-        score = 0
-        details = []
-        budget_potential = "Unknown"
-        
-        wealth_markers = {
-            'ads': [r'facebook\.com/tr', r'linkedin\.com/insight', r'adsbygoogle', r'google-analytics', r'googletagmanager'],
-            'tech': [r'shopify', r'hubspot', r'salesforce', r'magento', r'woocommerce'],
-            'keywords': [r'industrial', r'corporate', r'wholesale', r'enterprise', r'luxury', r'manufacturer', r'distributor']
-        }
-        
-        low_budget_markers = [r'wix\.com', r'blogspot\.com', r'wordpress\.com', r'weebly\.com']
-
-        try:
-            import requests
-            response = requests.get(url, headers=self.headers, timeout=10, allow_redirects=True)
-            html_content = response.text.lower()
-        except Exception as e:
-            return 0, ["Failed to access site"], "Unreachable"
-
-        # Check Ads
-        found_ads = [marker for marker in wealth_markers['ads'] if re.search(marker, html_content)]
-        if found_ads:
-            score += 40
-            details.append(f"Ads Detected ({len(found_ads)})")
-
-        # Check Tech
-        found_tech = [marker for marker in wealth_markers['tech'] if re.search(marker, html_content)]
-        if found_tech:
-            score += 30
-            details.append(f"Premium Tech ({len(found_tech)})")
-        
-        # Check Keywords
-        found_kws = [kw for kw in wealth_markers['keywords'] if kw in html_content]
-        if found_kws:
-            score += 20
-            details.append(f"High-Ticket Keywords ({len(found_kws)})")
-
-        # Check Low Budget
-        if any(re.search(lb, html_content) for lb in low_budget_markers):
-            score -= 10
-            details.append("Free/Page-Builder Detected")
-
-        # Determine Budget Potential
-        if score >= 50:
-            budget_potential = "High (Target Met)"
-        elif score >= 20:
-            budget_potential = "Medium"
-        else:
-            budget_potential = "Low"
-
-        return score, ", ".join(details), budget_potential
-
 # --- SCRAPER LOGIC WITH PLAYWRIGHT (HUMAN-LIKE) ---
 
-def run_google_maps_scraper(keyword, search_location, latitude, longitude, zoom_level, max_results, progress_bar, status_text, reviews_threshold, vetting_threshold):
-    """Scrapes Google Maps using Playwright with stealth - acts like a human"""
+def parse_listing_details(item, metrics, parser):
+    """
+    Detail enrichment: extracts contact, review and claimed data from an opened listing.
+    Parsing runs through the ParseExecutor so it can use other cores.
+    """
+    with metrics.span('detail_parse', 'https://www.google.com/maps'):
+        # The page HTML isn't needed once parsed - drop it so queued items stay small
+        details = parser.parse_place(item.pop('content'))
+    
+    return {
+        'name': item['name'],
+        'phone': details['phone'] or "N/A",
+        'website': details['website'] or "N/A",
+        'rating': details['rating'] or "0",
+        'reviews': details['reviews'] or 0,
+        'claimed': details['claimed'],
+    }
+
+def run_google_maps_scraper(keyword, search_location, latitude, longitude, zoom_level, max_results, progress_bar, status_text, reviews_threshold, vetting_threshold, metrics=None, concurrency=None, queue_size=DEFAULT_QUEUE_SIZE, parse_workers=None, on_lead=None):
+    """
+    Scrapes Google Maps using Playwright with stealth - acts like a human.
+    Opened listings are handed to a pipeline so parsing and vetting run while the next one loads.
+    `on_lead(lead)` is called on this thread as each lead is finished.
+    """
     leads = []
+    metrics = metrics or Metrics()
     
     with sync_playwright() as p:
+        launch_start = time.perf_counter()
+        
         # Launch browser with human-like settings
         browser = p.chromium.launch(
             headless=True,  # Set to False to see the browser
@@ -126,6 +96,7 @@ def run_google_maps_scraper(keyword, search_location, latitude, longitude, zoom_
         stealth_sync(context)
         
         page = context.new_page()
+        metrics.record('browser_launch', time.perf_counter() - launch_start)
         
         try:
             query = f"{keyword} in {search_location}"
@@ -137,14 +108,16 @@ def run_google_maps_scraper(keyword, search_location, latitude, longitude, zoom_
             url = f"https://www.google.com/maps/search/{encoded_query}/@{latitude},{longitude},{zoom_level}z"
             
             status_text.text("🌐 Opening Google Maps (acting like a human browser)...")
-            page.goto(url, timeout=60000, wait_until='networkidle')
+            with metrics.span('search_fetch', url):
+                page.goto(url, timeout=60000, wait_until='networkidle')
             
             # Human-like wait
             random_sleep(3, 5)
             
             # Wait for results feed
             try:
-                page.wait_for_selector('div[role="feed"]', timeout=15000)
+                with metrics.span('search_feed_wait', url):
+                    page.wait_for_selector('div[role="feed"]', timeout=15000)
                 status_text.text("✅ Found results feed, scrolling to load more...")
             except:
                 status_text.text("⚠️ Could not find results feed. Trying to continue...")
@@ -168,8 +141,9 @@ def run_google_maps_scraper(keyword, search_location, latitude, longitude, zoom_
                     break
                 
                 # Human-like scroll
-                human_scroll(page, feed_selector, scrolls=2)
-                random_sleep(2, 4)
+                with metrics.span('search_scroll', url):
+                    human_scroll(page, feed_selector, scrolls=2)
+                    random_sleep(2, 4)
                 
                 # Check if new listings appeared
                 new_listings = page.locator(listing_selector).all()
@@ -182,106 +156,69 @@ def run_google_maps_scraper(keyword, search_location, latitude, longitude, zoom_
             listings = page.locator(listing_selector).all()[:max_results]
             status_text.text(f"✅ Found {len(listings)} listings. Extracting details...")
             
-            vetter = VettingEngine()
-            progress_step = 1.0 / len(listings) if listings else 0
-            current_progress = 0.0
-
-            for i, listing in enumerate(listings):
-                try:
-                    # Scroll listing into view (human-like)
-                    listing.scroll_into_view_if_needed()
-                    random_sleep(1, 2)
-                    
-                    # Get name from listing
-                    name = listing.get_attribute("aria-label")
-                    if not name or name == "Results":
-                        name = listing.inner_text() or "Unknown"
-                    name = name.strip()
-                    
-                    if not name or name == "Unknown":
-                        continue
-                    
-                    status_text.text(f"🔎 Processing: {name} ({i+1}/{len(listings)})")
-                    
-                    # Click to open details (human-like)
-                    listing.click()
-                    random_sleep(2, 4)  # Human wait time
-                    
-                    # Wait for detail pane to load
+            vetter = VettingEngine(metrics=metrics, tiers=(vetting_threshold, vetting_threshold / 2))
+            parser = get_parse_executor(parse_workers)
+            
+            def open_listings():
+                """Listing discovery: opens each listing on the page - Playwright must stay on this thread"""
+                for i, listing in enumerate(listings):
                     try:
-                        page.wait_for_selector('div[role="main"]', timeout=5000)
-                    except:
-                        pass
-                    
-                    # Get page content
-                    content = page.content()
-                    soup = BeautifulSoup(content, 'html.parser')
-                    
-                    # Extract phone
-                    phone_btn = soup.find('button', attrs={'data-item-id': re.compile(r'phone:')})
-                    phone = phone_btn['aria-label'].replace("Phone: ", "").strip() if phone_btn else "N/A"
-                    
-                    # Extract website
-                    website_btn = soup.find('a', attrs={'data-item-id': "authority"})
-                    website = website_btn['href'] if website_btn else "N/A"
-                    
-                    # Extract rating
-                    rating_span = soup.find('span', attrs={'role': 'img', 'aria-label': re.compile(r'stars')})
-                    rating = rating_span['aria-label'].split(" ")[0] if rating_span else "0"
-                    
-                    # Extract reviews count
-                    reviews_btn = soup.find('button', attrs={'aria-label': re.compile(r'reviews')})
-                    reviews_text = reviews_btn['aria-label'] if reviews_btn else "0"
-                    reviews_count = int(re.search(r'(\d+)', reviews_text.replace(',','')).group(1)) if re.search(r'\d+', reviews_text) else 0
-
-                    # Claimed status
-                    claimed_btn = soup.find('button', attrs={'data-item-id': 'merchant'})
-                    is_claimed = "Unclaimed" if claimed_btn else "Claimed"
-                    
-                    # Lead filtering
-                    lead_status = "Standard"
-                    if reviews_count < reviews_threshold or is_claimed == "Unclaimed":
-                        lead_status = "High Priority New Lead"
-                    
-                    # Vetting
-                    vetting_score = 0
-                    vetting_details = ""
-                    budget = "N/A"
-                    
-                    if website != "N/A":
-                        vetting_score, vetting_details, _ = vetter.analyze_site(website)
+                        # Scroll listing into view (human-like)
+                        listing.scroll_into_view_if_needed()
+                        random_sleep(1, 2)
                         
-                        if vetting_score >= vetting_threshold:
-                            budget = "High (Target Met)"
-                        elif vetting_score >= (vetting_threshold / 2):
-                            budget = "Medium"
-                        else:
-                            budget = "Low"
-                    
-                    lead = {
-                        "Name": name,
-                        "Phone": phone,
-                        "Website": website,
-                        "Reviews": reviews_count,
-                        "Rating": rating,
-                        "Status": is_claimed,
-                        "Lead Type": lead_status,
-                        "Vetting Score": vetting_score,
-                        "Markers": vetting_details,
-                        "Est. Budget": budget
-                    }
-                    leads.append(lead)
+                        # Get name from listing
+                        name = listing.get_attribute("aria-label")
+                        if not name or name == "Results":
+                            name = listing.inner_text() or "Unknown"
+                        name = name.strip()
+                        
+                        if not name or name == "Unknown":
+                            continue
+                        
+                        status_text.text(f"🔎 Processing: {name} ({i+1}/{len(listings)})")
+                        
+                        # Click to open details (human-like)
+                        with metrics.span('detail_fetch', url):
+                            listing.click()
+                            random_sleep(2, 4)  # Human wait time
+                            
+                            # Wait for detail pane to load
+                            try:
+                                page.wait_for_selector('div[role="main"]', timeout=5000)
+                            except:
+                                pass
+                            
+                            # Get page content
+                            content = page.content()
+                    except Exception as e:
+                        st.warning(f"Error processing listing {i+1}: {e}")
+                        continue
                     
-                    current_progress += progress_step
-                    progress_bar.progress(min(current_progress, 1.0))
-                    status_text.text(f"✅ Processed: {name}")
+                    yield {'name': name, 'content': content}
                     
                     # Human-like pause between listings
                     random_sleep(1, 2)
-                    
-                except Exception as e:
-                    st.warning(f"Error processing listing {i+1}: {e}")
-                    continue
+            
+            progress_step = 1.0 / len(listings) if listings else 0
+            progress = {'value': 0.0}
+            
+            def on_result(lead):
+                progress['value'] += progress_step
+                progress_bar.progress(min(progress['value'], 1.0))
+                status_text.text(f"✅ Processed: {lead['Name']}")
+                if on_lead:
+                    on_lead(lead)
+            
+            # Parsing, vetting and classification overlap with opening the next listing
+            pipeline = lead_pipeline(
+                lambda item: parse_listing_details(item, metrics, parser),
+                vetter, reviews_threshold, vetting_threshold, metrics,
+                concurrency=concurrency, queue_size=queue_size
+            )
+            leads = pipeline.run(open_listings(), on_result=on_result)
+            for stage_name, error in pipeline.errors:
+                st.warning(f"Error processing listing ({stage_name}): {error}")
 
         except Exception as e:
             st.error(f"Critical Scraper Error: {e}")
@@ -289,11 +226,102 @@ def run_google_maps_scraper(keyword, search_location, latitude, longitude, zoom_
             st.code(traceback.format_exc())
         finally:
             browser.close()
+            global_metrics.merge(metrics)
             
     return leads
 
 # --- UI LAYOUT ---
 
+# --- RESULT CACHE ---
+
+# Finished searches are kept so widget changes and repeated searches don't re-scrape
+RESULTS_TTL = float(os.getenv('LEADSTOOL_UI_RESULTS_TTL_MINUTES', '60')) * 60
+
+def search_key(search):
+    """
+    Cache key for a search - thresholds and filters are applied to cached leads, so they're not part of it.
+    In tiered vetting mode the vetting threshold decides how much of each site was read, so it is.
+    """
+    return json.dumps([
+        search['keyword'].strip().lower(),
+        normalize_query(search['location']),
+        search['zoom'],
+        search['max_results'],
+        search['engine'],
+        search.get('vetting'),
+    ])
+
+def load_results(search):
+    """
+    Returns the cached {'leads', 'saved'} entry of a search, or None if missing, expired
+    or scored with vetting rules that have changed since
+    """
+    cache = get_ttl_cache('ui_results', RESULTS_TTL)
+    if cache:
+        entry = cache.get(search_key(search))
+    else:
+        # Cache disabled - keep results for this browser session only
+        entry = st.session_state.setdefault('results', {}).get(search_key(search))
+        if entry and time.time() - entry['saved'] >= RESULTS_TTL:
+            entry = None
+    if entry and any(lead.get('Rules Version', "") not in ("", current_rules().version) for lead in entry['leads']):
+        return None
+    return entry
+
+def save_results(search, leads):
+    entry = {'leads': leads, 'saved': time.time()}
+    cache = get_ttl_cache('ui_results', RESULTS_TTL)
+    if cache:
+        cache.put(search_key(search), entry)
+    else:
+        st.session_state.setdefault('results', {})[search_key(search)] = entry
+
+def show_results(leads, search, only_no_website, reviews_threshold, vetting_threshold):
+    """Renders the leads of a search with the current thresholds and filters"""
+    df = pd.DataFrame([reclassify_lead(lead, reviews_threshold, vetting_threshold) for lead in leads])
+    
+    # Apply Filters
+    if only_no_website:
+        df = df[df['Website'] == "N/A"]
+        st.info(f"Filtered to {len(df)} leads without websites.")
+    
+    # Metric Cards
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Total Leads", len(df))
+    c2.metric("High Priority", len(df[df['Lead Type'] == "High Priority New Lead"]))
+    c3.metric("Sites Vetted", len(df[df['Website'] != "N/A"]))
+    
+    st.dataframe(df, use_container_width=True)
+    
+    # Export
+    csv = df.to_csv(index=False).encode('utf-8')
+    st.download_button(
+        label="📥 Download Results (CSV)",
+        data=csv,
+        file_name=f"leads_{search['keyword']}_{search['location']}.csv",
+        mime="text/csv"
+    )
+
+def show_run_reports(run):
+    """Timings and memory use of the last scrape"""
+    with st.expander("⏱️ Run Timings"):
+        st.json(run['timings'])
+        st.download_button(
+            label="📥 Download Metrics (Prometheus)",
+            data=run['prometheus'].encode('utf-8'),
+            file_name="leadstool_metrics.txt",
+            mime="text/plain"
+        )
+    
+    with st.expander("🧠 Memory Usage"):
+        report = run['memory']
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Peak RSS", f"{report['peak_rss_mb']} MB")
+        m2.metric("RSS Growth", f"{round(report['end_rss_mb'] - report['start_rss_mb'], 2)} MB")
+        m3.metric("Traced Peak", f"{report['traced_peak_mb']} MB" if report['top_allocations'] else "off")
+        if report['top_allocations']:
+            st.dataframe(pd.DataFrame(report['top_allocations']), use_container_width=True)
+
 def main():
     st.set_page_config(page_title="Local Maps Leads Pro", layout="wide", page_icon="🗺️")
     
@@ -318,6 +346,15 @@ def main():
         
         max_results = st.number_input("Max Results", min_value=1, max_value=50, value=5)
         
+        engine = st.selectbox(
+            "Scraper Engine",
+            ["Playwright (Human-like Browser)", "Async HTTP (Fast, No Browser)"],
+            help="The async engine fetches pages and vets sites concurrently without a browser, but Google may return fewer listings."
+        )
+        
+        profile_memory = st.checkbox("Profile Memory", help="Tracks the largest Python allocations of the run (slower). Peak RSS is always shown.")
+        refresh = st.checkbox("Ignore Cached Results", help=f"Scrape again even if this search ran in the last {int(RESULTS_TTL // 60)} minutes.")
+        
         submitted = st.form_submit_button("🚀 Start Scraping")
     
     st.sidebar.markdown("---")
@@ -329,18 +366,17 @@ def main():
         if not keyword or not location_input:
             st.error("Please enter both keyword and location.")
         else:
+            metrics = Metrics()
+            
             # Geocoding
             try:
-                geolocator = Nominatim(user_agent="maps_scraper_app_v1", timeout=10)
-                location_data = geolocator.geocode(location_input)
+                location_data = geocode(location_input, metrics=metrics)
                 
                 if not location_data:
                     st.error(f"Could not find coordinates for: {location_input}")
                 else:
-                    lat = location_data.latitude
-                    lon = location_data.longitude
-                    
-                    st.success(f"📍 Found Location: {location_data.address} ({lat}, {lon})")
+                    lat = location_data['lat']
+                    lon = location_data['lon']
                     
                     # Convert Radius to Zoom Level
                     if radius_km <= 2: zoom = 15
@@ -355,55 +391,89 @@ def main():
                 location_data = None
 
             if location_data:
-                try:
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    with st.spinner("🤖 Initializing human-like browser (Playwright + Stealth)..."):
-                        data = run_google_maps_scraper(
-                            keyword, 
-                            location_input, 
-                            lat, lon, zoom, 
-                            max_results, 
-                            progress_bar, 
-                            status_text, 
-                            reviews_threshold, 
-                            vetting_threshold
-                        )
-
-                    if data:
-                        st.success(f"✅ Scraping Completed! Found {len(data)} leads.")
+                search = {
+                    'keyword': keyword,
+                    'location': location_input,
+                    'address': location_data['address'],
+                    'lat': lat,
+                    'lon': lon,
+                    'zoom': zoom,
+                    'max_results': int(max_results),
+                    'engine': "async" if engine.startswith("Async") else "playwright",
+                    'vetting': f"tiered:{vetting_threshold}" if os.getenv('LEADSTOOL_VETTING_MODE', 'full') == 'tiered' else None,
+                }
+                st.session_state['search'] = search
+                
+                if refresh or load_results(search) is None:
+                    try:
+                        st.success(f"📍 Found Location: {location_data['address']} ({lat}, {lon})")
+                        progress_bar = st.progress(0)
+                        status_text = st.empty()
                         
-                        df = pd.DataFrame(data)
+                        # Leads appear in this table as they finish
+                        live_rows = []
+                        live_table = st.empty()
                         
-                        # Apply Filters
-                        if only_no_website:
-                            df = df[df['Website'] == "N/A"]
-                            st.info(f"Filtered to {len(df)} leads without websites.")
+                        def on_lead(lead):
+                            live_rows.append(lead)
+                            live_table.dataframe(pd.DataFrame(live_rows), use_container_width=True)
                         
-                        # Metric Cards
-                        c1, c2, c3 = st.columns(3)
-                        c1.metric("Total Leads", len(df))
-                        c2.metric("High Priority", len(df[df['Lead Type'] == "High Priority New Lead"]))
-                        c3.metric("Sites Vetted", len(df[df['Website'] != "N/A"]))
+                        if search['engine'] == "async":
+                            scraper = run_async_scraper
+                            spinner_text = "⚡ Fetching and vetting concurrently (async engine)..."
+                        else:
+                            scraper = run_google_maps_scraper
+                            spinner_text = "🤖 Initializing human-like browser (Playwright + Stealth)..."
                         
-                        st.dataframe(df, use_container_width=True)
+                        with st.spinner(spinner_text), MemoryProfiler(trace=profile_memory) as memory:
+                            data = scraper(
+                                keyword, 
+                                location_input, 
+                                lat, lon, zoom, 
+                                max_results, 
+                                progress_bar, 
+                                status_text, 
+                                reviews_threshold, 
+                                vetting_threshold,
+                                metrics=metrics,
+                                on_lead=on_lead
+                            )
                         
-                        # Export
-                        csv = df.to_csv(index=False).encode('utf-8')
-                        st.download_button(
-                            label="📥 Download Results (CSV)",
-                            data=csv,
-                            file_name=f"leads_{keyword}_{location_input}.csv",
-                            mime="text/csv"
-                        )
-                    else:
-                        st.warning("No leads found. Try a different location or increase wait times.")
-                
-                except Exception as e:
-                    import traceback
-                    st.error(f"Execution Error: {e}")
-                    st.code(traceback.format_exc())
+                        # The full table is rendered below from the saved results
+                        progress_bar.empty()
+                        status_text.empty()
+                        live_table.empty()
+                        if data:
+                            save_results(search, data)
+                        else:
+                            st.warning("No leads found. Try a different location or increase wait times.")
+                        
+                        st.session_state['run'] = {
+                            'search': search_key(search),
+                            'timings': metrics.summary(),
+                            'prometheus': metrics.to_prometheus(),
+                            'memory': memory.summary(),
+                        }
+                    
+                    except Exception as e:
+                        import traceback
+                        st.error(f"Execution Error: {e}")
+                        st.code(traceback.format_exc())
+    
+    # Results of the current search - shown again on every rerun, e.g. when a filter changes
+    search = st.session_state.get('search')
+    if search:
+        entry = load_results(search)
+        run = st.session_state.get('run')
+        fresh = run and run['search'] == search_key(search)
+        if entry:
+            st.success(f"✅ {len(entry['leads'])} leads for \"{search['keyword']}\" near {search['address']}")
+            if not fresh:
+                age = int((time.time() - entry['saved']) // 60)
+                st.caption(f"Cached results from {age} min ago - tick \"Ignore Cached Results\" to scrape again.")
+            show_results(entry['leads'], search, only_no_website, reviews_threshold, vetting_threshold)
+        if fresh:
+            show_run_reports(run)
 
 if __name__ == "__main__":
     main()
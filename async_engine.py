@@ -0,0 +1,437 @@
+"""
+Asyncio scraping engine
+Same flow and output as core.run_google_maps_scraper, but all HTTP is non-blocking
+so a single process can fetch and vet hundreds of sites concurrently
+"""
+import asyncio
+import os
+import random
+import threading
+import urllib.parse
+
+import aiohttp
+
+from cache import get_response_cache
+from connectivity import is_parked
+from core import BROWSER_HEADERS, READ_CHUNK, VettingEngine, body_decoder, classify_lead, listing_cost
+from deadline import DeadlineExceeded
+from memory import AsyncBodySlot, async_body_slots
+from metrics import Metrics, global_metrics, host_of
+from parse_pool import extract_listings, extract_place, get_parse_executor
+from places import place_details_async, text_search_async
+from ratelimit import HOST_INTERVALS, AsyncRateLimiter
+from rules import BodyScan
+
+# --- CONFIGURATION ---
+
+DEFAULT_MAX_CONNECTIONS = 200
+DEFAULT_PER_HOST = 4
+
+# Google gets fewer parallel requests and some spacing; business sites use DEFAULT_PER_HOST
+DEFAULT_HOST_LIMITS = {
+    'www.google.com': 2,
+    'maps.googleapis.com': 10,
+}
+DEFAULT_HOST_INTERVALS = dict(HOST_INTERVALS)
+
+# --- ASYNC HTTP CLIENT ---
+
+class AsyncHTTPClient:
+    """
+    Shared aiohttp session with a global connection cap, per-host semaphores,
+    per-host request spacing, retries and response-cache revalidation.
+    Use as `async with AsyncHTTPClient(...) as http:`.
+    """
+
+    def __init__(self, metrics=None, max_connections=DEFAULT_MAX_CONNECTIONS, per_host=DEFAULT_PER_HOST,
+                 host_limits=None, host_intervals=None, cache=None):
+        self.metrics = metrics or Metrics()
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.host_limits = dict(DEFAULT_HOST_LIMITS, **(host_limits or {}))
+        intervals = dict(DEFAULT_HOST_INTERVALS, **(host_intervals or {}))
+        self._host_limiters = {host: AsyncRateLimiter(interval) for host, interval in intervals.items()}
+        self._host_semaphores = {}
+        self.cache = cache if cache is not None else get_response_cache()
+        # Caps page bodies alive at once in memory-bounded mode
+        self.body_slots = async_body_slots()
+        self._session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+        self._session = aiohttp.ClientSession(connector=connector)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+
+    def _semaphore(self, host):
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.host_limits.get(host, self.per_host))
+        return self._host_semaphores[host]
+
+    async def _throttle(self, host):
+        limiter = self._host_limiters.get(host)
+        if limiter:
+            await limiter.wait()
+
+    def body_slot(self):
+        """An AsyncBodySlot to pass to get_text(slot=...), taken only for the download"""
+        return AsyncBodySlot(self.body_slots)
+
+    async def get_text(self, url, headers=None, timeout=30, max_retries=1, stage='fetch', raise_for_status=True, inspect=None, slot=None, scan=None):
+        """
+        GETs a page and returns its text, retrying failed attempts with a random 2-5 s backoff.
+        `timeout` is a total in seconds or a (connect, read) tuple.
+        `inspect(headers, urls)` is called before a fresh body is read; if it returns False
+        the body is not downloaded and None is returned.
+        `scan(text)` is called with each lowercased chunk of a fresh body; if it returns
+        True the rest is not downloaded and None is returned.
+        A `slot` (body_slot()) is taken after the rate-limit wait and released for retry backoffs.
+        """
+        for attempt in range(max_retries):
+            try:
+                return await self._get_text_once(url, headers, timeout, stage, raise_for_status, inspect, slot, scan)
+            except Exception:
+                if slot:
+                    slot.release()
+                if attempt < max_retries - 1:
+                    self.metrics.incr(f"{stage}_retries")
+                    with self.metrics.span('retry_backoff', url):
+                        await asyncio.sleep(random.uniform(2, 5))
+                    continue
+                raise
+
+    async def _get_text_once(self, url, headers, timeout, stage, raise_for_status, inspect=None, slot=None, scan=None):
+        host = host_of(url)
+        request_headers = dict(headers or {})
+        # The cache is sqlite - its calls run on a worker thread so they don't stall the event loop
+        entry = await asyncio.to_thread(self.cache.get, url, {**self._session.headers, **request_headers}) if self.cache else None
+        if entry:
+            if entry['etag']:
+                request_headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request_headers['If-Modified-Since'] = entry['last_modified']
+
+        async with self._semaphore(host):
+            await self._throttle(host)
+            if slot:
+                await slot.acquire()
+            with self.metrics.span(stage, url):
+                async with self._session.get(url, headers=request_headers, allow_redirects=True,
+                                             timeout=_client_timeout(timeout)) as response:
+                    if response.status == 304 and entry:
+                        await asyncio.to_thread(self.cache.touch, url)
+                        self.metrics.incr('http_cache_revalidated')
+                        return _decode(entry['body'], entry['encoding'])
+                    if raise_for_status:
+                        response.raise_for_status()
+                    if inspect:
+                        urls = [str(r.url) for r in response.history] + [str(response.url)]
+                        if not inspect(response.headers, urls):
+                            return None
+                    if scan:
+                        chunks = []
+                        decoder = body_decoder(response.charset)
+                        async for chunk in response.content.iter_chunked(READ_CHUNK):
+                            chunks.append(chunk)
+                            if scan(decoder.decode(chunk).lower()):
+                                return None
+                        body = b''.join(chunks)
+                    else:
+                        body = await response.read()
+                    try:
+                        encoding = response.get_encoding()
+                    except (RuntimeError, LookupError):
+                        encoding = 'utf-8'
+
+        if self.cache and response.status == 200:
+            if await asyncio.to_thread(self.cache.store, url, response.headers, body, str(response.url), encoding, response.request_info.headers):
+                self.metrics.incr('http_cache_stored')
+        return _decode(body, encoding)
+
+    async def get_json(self, url, params=None, timeout=10, stage='fetch'):
+        """GETs a JSON API response (not cached)"""
+        host = host_of(url)
+        async with self._semaphore(host):
+            await self._throttle(host)
+            with self.metrics.span(stage, url):
+                async with self._session.get(url, params=params,
+                                             timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                    return await response.json(content_type=None)
+
+def _client_timeout(timeout):
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+    return aiohttp.ClientTimeout(total=timeout)
+
+def _decode(body, encoding):
+    try:
+        return body.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+# --- SCRAPER ---
+
+async def _within(deadline, awaitable):
+    """Awaits with the time the deadline has left, raising DeadlineExceeded when it runs out"""
+    if not deadline:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, deadline.remaining())
+    except asyncio.TimeoutError:
+        if deadline.expired:
+            raise DeadlineExceeded("deadline passed") from None
+        raise
+
+async def _vet_record(record, http, vetter):
+    """Async counterpart of core.vet_record"""
+    record['vetting_score'] = 0
+    record['vetting_details'] = ""
+    record['rules_version'] = ""
+    if record['website'] == "N/A":
+        return record
+    
+    connectivity = vetter.connectivity
+    rules = vetter.active_rules()
+    record['rules_version'] = rules.version
+    header_found = None
+    body_scan = None
+    body_read = False
+
+    def inspect(headers, urls):
+        # Header-first tier: skip the body when the headers already decide the score tier
+        nonlocal header_found, body_scan, body_read
+        header_found = rules.header_findings(headers, urls)
+        body_scan = BodyScan(rules, header_found)
+        body_read = False
+        return rules.needs_body(header_found, headers.get('Content-Type'), vetter.tiers)
+
+    def scan(text):
+        # Stop reading once the rest of the page can't change the tier
+        nonlocal body_read
+        body_read = True
+        body_scan.feed(text)
+        return body_scan.settled(vetter.tiers)
+
+    ok, reason = await connectivity.check_async(record['website'])
+    # The body slot is held until the page is scored (memory-bounded mode)
+    async with http.body_slot() as slot:
+        if ok:
+            try:
+                html_content = await http.get_text(record['website'], headers=vetter.headers, timeout=connectivity.timeout,
+                                                   stage='vet_fetch', raise_for_status=False, slot=slot,
+                                                   inspect=inspect if vetter.mode == 'tiered' else None,
+                                                   scan=scan if vetter.mode == 'tiered' else None)
+            except aiohttp.ClientConnectorError:
+                await asyncio.to_thread(connectivity.mark_dead, record['website'], 'connect_failed')
+                ok = False
+            except Exception:
+                ok = False
+        if not ok:
+            http.metrics.incr('vet_unreachable')
+            record['vetting_details'] = ["Failed to access site"]
+            return record
+
+        if html_content is None:
+            if body_read:
+                http.metrics.incr('vet_body_partial')
+                score, details = body_scan.score()
+                details.append("Partial Read")
+            else:
+                http.metrics.incr('vet_body_skipped')
+                score, details = rules.score(None, header_found)
+                details.append("Header Check Only")
+            record['vetting_score'], record['vetting_details'], _ = rules.result(score, details)
+            return record
+
+        html_content = html_content.lower()
+        if is_parked(html_content):
+            await asyncio.to_thread(connectivity.mark_dead, record['website'], 'parked')
+        record['vetting_score'], record['vetting_details'], _ = await asyncio.to_thread(
+            vetter.score_site, html_content, record['website'], header_found, rules
+        )
+    return record
+
+async def _enrich_listing(listing, http, parser):
+    """Async counterpart of core.enrich_listing"""
+    record = {
+        'name': listing.get('name', 'Unknown'),
+        'phone': listing.get('phone', 'N/A'),
+        'website': listing.get('website', 'N/A'),
+        'rating': listing.get('rating', '0'),
+        'reviews': listing.get('reviews', 0),
+    }
+
+    if listing.get('url') and record['website'] == 'N/A':
+        place_url = f"https://www.google.com{listing['url']}" if listing['url'].startswith('/') else listing['url']
+        try:
+            async with http.body_slot() as slot:
+                place_html = await http.get_text(place_url, headers=BROWSER_HEADERS, max_retries=3, stage='place_fetch', slot=slot)
+                with http.metrics.span('place_parse', place_url):
+                    place_details = await parser.run_async(extract_place, place_html.encode('utf-8'))
+                place_html = None
+
+            if record['phone'] == 'N/A' and place_details['phone']:
+                record['phone'] = place_details['phone']
+            if record['website'] == 'N/A' and place_details['website']:
+                record['website'] = place_details['website']
+            if place_details['rating']:
+                record['rating'] = place_details['rating']
+            if place_details['reviews'] is not None:
+                record['reviews'] = place_details['reviews']
+        except Exception:
+            pass
+
+    return record
+
+async def _enrich_place(place, http, api_key):
+    """Async counterpart of core.enrich_place"""
+    record = {
+        'name': place.get('name', 'Unknown'),
+        'rating': str(place.get('rating', 0)),
+        'reviews': place.get('user_ratings_total', 0),
+        'phone': 'N/A',
+        'website': 'N/A',
+    }
+    place_id = place.get('place_id')
+    if place_id:
+        details_data = await place_details_async(http, place_id, api_key)
+        if details_data.get('status') == 'OK':
+            result = details_data.get('result', {})
+            record['phone'] = result.get('formatted_phone_number', 'N/A')
+            record['website'] = result.get('website', 'N/A')
+    return record
+
+async def scrape_async(keyword, search_location, latitude, longitude, zoom_level, max_results, reviews_threshold, vetting_threshold,
+                       metrics=None, on_result=None, status_text=None, parse_workers=None, vetting_mode=None, deadline=None,
+                       **client_options):
+    """
+    Coroutine version of core.run_google_maps_scraper.
+    Every listing is enriched, vetted and classified as its own task; concurrency
+    is bounded by the client's connection cap and per-host semaphores.
+    HTML parsing goes to the process pool when `parse_workers` (or LEADSTOOL_PARSE_WORKERS) is > 0.
+    `vetting_mode` 'tiered' vets from response headers first (default: LEADSTOOL_VETTING_MODE).
+    With a deadline.Deadline, cheap listings are started first and tasks still
+    running when it passes are cancelled; their names are recorded on the deadline.
+    `client_options` are passed to AsyncHTTPClient.
+    """
+    metrics = metrics or Metrics()
+    vetter = VettingEngine(metrics=metrics, mode=vetting_mode, tiers=(vetting_threshold, vetting_threshold / 2))
+    parser = get_parse_executor(parse_workers)
+
+    def status(message):
+        if status_text:
+            status_text.text(message)
+
+    try:
+        async with AsyncHTTPClient(metrics=metrics, **client_options) as http:
+            api_key = os.getenv('GOOGLE_MAPS_API_KEY', '')
+
+            if api_key:
+                data = await _within(deadline, text_search_async(http, keyword, latitude, longitude, api_key))
+                if data.get('status') != 'OK':
+                    return []
+                items = data.get('results', [])[:max_results]
+                enrich = lambda place: _enrich_place(place, http, api_key)
+            else:
+                query = f"{keyword} in {search_location}"
+                status(f"Searching for: {query} near ({latitude}, {longitude})")
+                url = f"https://www.google.com/maps/search/{urllib.parse.quote(query)}/@{latitude},{longitude},{zoom_level}z"
+
+                async with http.body_slot() as slot:
+                    html_content = await _within(deadline, http.get_text(url, headers=BROWSER_HEADERS, max_retries=3, stage='search_fetch', slot=slot))
+                    with metrics.span('search_parse', url):
+                        items = await parser.run_async(extract_listings, html_content.encode('utf-8'), max_results)
+                    html_content = None
+                if not items:
+                    status("No listings found. Google Maps loads content with JavaScript. Consider using Google Maps Places API for reliable results.")
+                    return []
+                enrich = lambda listing: _enrich_listing(listing, http, parser)
+
+            async def process(item):
+                record = await enrich(item)
+                vetter.prefetch(record['website'])
+                record = await _vet_record(record, http, vetter)
+                lead = classify_lead(record, reviews_threshold, vetting_threshold)
+                if on_result:
+                    on_result(lead)
+                return lead
+
+            # Cheapest first: tasks created earlier get the connection slots first (costs read the details cache)
+            order = await asyncio.to_thread(sorted, range(len(items)), key=lambda i: listing_cost(items[i])) if deadline else range(len(items))
+            tasks = {i: asyncio.create_task(process(items[i])) for i in order}
+            pending = set()
+            if tasks:
+                _, pending = await asyncio.wait(tasks.values(), timeout=deadline.budget() if deadline else None)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+            leads = []
+            unfinished = []
+            for i in range(len(items)):
+                task = tasks[i]
+                if task in pending:
+                    unfinished.append(items[i].get('name', 'Unknown'))
+                elif task.exception():
+                    print(f"Error processing listing {i}: {task.exception()}")
+                else:
+                    leads.append(task.result())
+            if unfinished:
+                deadline.cut(unfinished)
+            return leads
+    except DeadlineExceeded:
+        # Ran out of time before any listing was found
+        deadline.cut()
+        return []
+    except Exception as e:
+        print(f"Critical Scraper Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return []
+    finally:
+        global_metrics.merge(metrics)
+
+# --- SYNC WRAPPER ---
+
+def run_sync(coro):
+    """Runs a coroutine to completion from synchronous code"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    # Already inside an event loop - run on a helper thread with its own loop
+    outcome = {}
+    def runner():
+        try:
+            outcome['result'] = asyncio.run(coro)
+        except BaseException as e:
+            outcome['error'] = e
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+def run_async_scraper(keyword, search_location, latitude, longitude, zoom_level, max_results, progress_bar, status_text, reviews_threshold, vetting_threshold, metrics=None, on_lead=None, **client_options):
+    """Blocking wrapper with the same arguments as core.run_google_maps_scraper"""
+    progress_step = 1.0 / max(1, max_results)
+    progress = {'value': 0.0}
+
+    def on_result(lead):
+        progress['value'] += progress_step
+        if progress_bar:
+            progress_bar.progress(min(progress['value'], 1.0))
+        if status_text:
+            status_text.text(f"Processed: {lead['Name']}")
+        if on_lead:
+            on_lead(lead)
+
+    return run_sync(scrape_async(
+        keyword, search_location, latitude, longitude, zoom_level, max_results, reviews_threshold, vetting_threshold,
+        metrics=metrics, on_result=on_result, status_text=status_text, **client_options
+    ))
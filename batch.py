@@ -0,0 +1,169 @@
+"""
+Batch searches over a grid of keywords x locations
+Sub-searches run concurrently through run_google_maps_scraper, sharing the HTTP
+connection pool, the per-host rate limits and one VettingEngine, and their
+leads are merged into a single de-duplicated list
+"""
+import os
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from core import VettingEngine, reclassify_lead, run_google_maps_scraper
+from geocode import geocode
+from metrics import Metrics, global_metrics, host_of
+from parse_pool import get_parse_executor
+from pipeline import DEFAULT_QUEUE_SIZE
+
+DEFAULT_BATCH_CONCURRENCY = int(os.getenv('LEADSTOOL_BATCH_CONCURRENCY', '3'))
+
+# --- LOCATIONS ---
+
+def resolve_locations(locations, metrics=None):
+    """
+    Turns location strings (or {'location', 'latitude', 'longitude'} dicts) into dicts
+    with coordinates. Returns (resolved, failed) - failed is a list of the inputs that
+    could not be geocoded.
+    """
+    metrics = metrics or Metrics()
+    resolved = []
+    failed = []
+    for location in locations:
+        if isinstance(location, dict) and location.get('latitude') is not None and location.get('longitude') is not None:
+            resolved.append({
+                'location': location.get('location', ''),
+                'latitude': float(location['latitude']),
+                'longitude': float(location['longitude']),
+            })
+            continue
+        name = location.get('location', '') if isinstance(location, dict) else location
+        try:
+            found = geocode(name, metrics=metrics)
+        except Exception as e:
+            print(f"Geocoding failed for '{name}': {e}")
+            found = None
+        if found:
+            resolved.append({'location': name, 'latitude': found['lat'], 'longitude': found['lon']})
+        else:
+            failed.append(name)
+    return resolved, failed
+
+# --- MERGING ---
+
+def lead_key(lead):
+    """
+    Identity of a business across searches - its website without scheme, "www.",
+    query or trailing slash (so facebook.com/a and facebook.com/b differ), else name + phone
+    """
+    if lead.get('Website', 'N/A') != 'N/A':
+        host = host_of(lead['Website'])
+        if host:
+            host = host[4:] if host.startswith('www.') else host
+            path = urllib.parse.urlsplit(lead['Website'].strip()).path.rstrip('/').lower()
+            return host + path
+    return f"{lead.get('Name', '').strip().lower()}|{lead.get('Phone', 'N/A')}"
+
+def same_business(a, b):
+    """Leads with the same key are only merged if their name or phone matches too"""
+    if a.get('Name', '').strip().lower() == b.get('Name', '').strip().lower():
+        return True
+    return a.get('Phone', 'N/A') != 'N/A' and a.get('Phone') == b.get('Phone')
+
+def merge_leads(results, reviews_threshold, vetting_threshold):
+    """
+    Merges (keyword, location, leads) tuples into one list in first-seen order.
+    Duplicates are combined: missing phone/website filled in, the higher review
+    count and vetting score kept (and the lead reclassified), and every matching
+    keyword and location listed.
+    """
+    merged = []
+    by_key = {}
+    for keyword, location, leads in results:
+        for lead in leads:
+            candidates = by_key.setdefault(lead_key(lead), [])
+            index = next((i for i in candidates if same_business(merged[i], lead)), None)
+            if index is None:
+                candidates.append(len(merged))
+                merged.append(dict(lead, Keywords=[], Locations=[]))
+                existing = merged[-1]
+            else:
+                existing = merged[index]
+                for field in ('Phone', 'Website'):
+                    if existing.get(field, 'N/A') == 'N/A' and lead.get(field, 'N/A') != 'N/A':
+                        existing[field] = lead[field]
+                changed = False
+                if lead.get('Reviews', 0) > existing.get('Reviews', 0):
+                    existing['Reviews'] = lead['Reviews']
+                    existing['Rating'] = lead['Rating']
+                    changed = True
+                if lead.get('Vetting Score', 0) > existing.get('Vetting Score', 0):
+                    for field in ('Vetting Score', 'Markers', 'Est. Budget', 'Rules Version'):
+                        existing[field] = lead[field]
+                    changed = True
+                if changed:
+                    existing = merged[index] = reclassify_lead(existing, reviews_threshold, vetting_threshold)
+            if keyword not in existing['Keywords']:
+                existing['Keywords'].append(keyword)
+            if location not in existing['Locations']:
+                existing['Locations'].append(location)
+    return merged
+
+# --- BATCH SEARCH ---
+
+def run_batch_search(keywords, locations, max_results, reviews_threshold, vetting_threshold, zoom_level=13,
+                     max_concurrent=DEFAULT_BATCH_CONCURRENCY, progress_bar=None, status_text=None, metrics=None,
+                     deadline=None, vetting_mode=None, concurrency=None, queue_size=DEFAULT_QUEUE_SIZE, parse_workers=None):
+    """
+    Runs run_google_maps_scraper for every keyword x location pair and returns the merged leads.
+    `locations` are strings (geocoded here) or dicts with 'latitude' / 'longitude'.
+    At most `max_concurrent` sub-searches run at once; Google requests from all of
+    them share the process-wide rate limits.
+    """
+    metrics = metrics or Metrics()
+    resolved, failed = resolve_locations(locations, metrics)
+    if failed:
+        metrics.incr('batch_locations_failed', len(failed))
+
+    searches = [(keyword, location) for location in resolved for keyword in keywords if keyword.strip()]
+    if not searches:
+        return []
+
+    # Start the parse pool (if any) before the search threads
+    get_parse_executor(parse_workers)
+
+    # One engine for the whole batch: a site matched by several searches is vetted once
+    vet_metrics = Metrics()
+    vetter = VettingEngine(metrics=vet_metrics, mode=vetting_mode, tiers=(vetting_threshold, vetting_threshold / 2), deadline=deadline)
+
+    lock = threading.Lock()
+    finished = [0]
+
+    def search(keyword, location):
+        run_metrics = Metrics()
+        leads = run_google_maps_scraper(
+            keyword, location['location'], location['latitude'], location['longitude'], zoom_level, max_results,
+            None, None, reviews_threshold, vetting_threshold,
+            metrics=run_metrics, concurrency=concurrency, queue_size=queue_size, parse_workers=parse_workers,
+            deadline=deadline, vetter=vetter
+        )
+        metrics.merge(run_metrics)
+        with lock:
+            finished[0] += 1
+            if progress_bar:
+                progress_bar.progress(finished[0] / len(searches))
+            if status_text:
+                status_text.text(f"Finished search {finished[0]}/{len(searches)}: {keyword} in {location['location']}")
+        return keyword, location['location'], leads
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, int(max_concurrent)), thread_name_prefix='batch') as pool:
+            futures = [pool.submit(search, keyword, location) for keyword, location in searches]
+            results = [future.result() for future in futures]
+    finally:
+        metrics.merge(vet_metrics)
+        global_metrics.merge(vet_metrics)
+
+    metrics.incr('batch_searches', len(searches))
+    leads = merge_leads(results, reviews_threshold, vetting_threshold)
+    metrics.incr('batch_duplicate_leads', sum(len(r[2]) for r in results) - len(leads))
+    return leads
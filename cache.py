@@ -0,0 +1,317 @@
+"""
+On-disk caches shared by the scraper and vetting code
+Uses sqlite3 from the standard library so it also works on a serverless /tmp
+"""
+import http.cookiejar
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# --- CONFIGURATION & HELPERS ---
+
+def default_cache_dir():
+    """Directory for cache files - LEADSTOOL_CACHE_DIR or a folder in the temp dir"""
+    path = os.getenv('LEADSTOOL_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'leadstool-cache')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def cache_enabled(name):
+    """Caches can be turned off with e.g. LEADSTOOL_HTTP_CACHE=0"""
+    return os.getenv(f"LEADSTOOL_{name.upper()}_CACHE", '1').lower() not in ('0', 'false', 'no', 'off')
+
+# --- KEY/VALUE CACHE ---
+
+class TTLCache:
+    """Persistent key/value cache with per-entry expiry - values are stored as JSON"""
+
+    def __init__(self, name, ttl, path=None):
+        self.name = name
+        self.ttl = ttl
+        self.path = path or os.path.join(default_cache_dir(), f"{name}.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+        self._conn.commit()
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+            if row and row[1] < time.time():
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+        if not row:
+            return default
+        return json.loads(row[0])
+
+    def put(self, key, value, ttl=None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires)
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+_ttl_caches = {}
+_ttl_caches_lock = threading.Lock()
+
+def get_ttl_cache(name, ttl):
+    """Returns the process-wide TTLCache called `name`, or None if disabled or unavailable"""
+    if not cache_enabled(name):
+        return None
+    with _ttl_caches_lock:
+        if name not in _ttl_caches:
+            try:
+                _ttl_caches[name] = TTLCache(name, ttl)
+            except (OSError, sqlite3.Error) as e:
+                print(f"{name} cache unavailable: {e}")
+                return None
+        return _ttl_caches[name]
+
+# --- HTTP RESPONSE CACHE ---
+
+class ResponseCache:
+    """
+    Stores response bodies together with their ETag / Last-Modified validators.
+    Responses marked Cache-Control: no-store or Vary: * are not stored; for other
+    Vary headers the request's values are kept and must match for the entry to be used.
+    The total body size is bounded; least recently used entries are evicted first.
+    The total is tracked as entries are stored and only recounted once it looks over
+    the bound, so entries stored by other processes are noticed late.
+    """
+
+    def __init__(self, path=None, max_bytes=None):
+        self.path = path or os.path.join(default_cache_dir(), 'http_cache.sqlite3')
+        if max_bytes is None:
+            max_bytes = int(os.getenv('LEADSTOOL_HTTP_CACHE_MB', '200')) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self._total = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, final_url TEXT,"
+            " encoding TEXT, headers TEXT, body BLOB, size INTEGER, stored REAL, accessed REAL, vary TEXT)"
+        )
+        # Caches created before Vary support lack the column
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(responses)")]
+        if 'vary' not in columns:
+            self._conn.execute("ALTER TABLE responses ADD COLUMN vary TEXT")
+        self._conn.commit()
+
+    def get(self, url, request_headers=None):
+        """
+        The cached entry of `url`, or None. With `request_headers`, an entry stored
+        for different values of the response's Vary headers is not returned.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, final_url, encoding, headers, body, vary FROM responses WHERE url = ?",
+                (url,)
+            ).fetchone()
+        if not row:
+            return None
+        vary = json.loads(row[6] or '{}')
+        if request_headers is not None and vary != vary_values(vary, request_headers):
+            return None
+        return {
+            'etag': row[0],
+            'last_modified': row[1],
+            'final_url': row[2],
+            'encoding': row[3],
+            'headers': json.loads(row[4] or '{}'),
+            'body': row[5],
+        }
+
+    def put(self, url, response):
+        """Stores a 200 response if it carries a validator; returns True if stored"""
+        request_headers = response.request.headers if response.request is not None else {}
+        return self.store(url, response.headers, response.content, response.url, response.encoding, request_headers)
+
+    def store(self, url, headers, body, final_url=None, encoding=None, request_headers=None):
+        """Stores a body with its response headers; returns True if it was cacheable"""
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        vary = [name.strip().lower() for name in headers.get('Vary', '').split(',') if name.strip()]
+        if 'no-store' in headers.get('Cache-Control', '').lower() or '*' in vary:
+            # Don't keep (or keep revalidating) a copy the server says not to store
+            self.delete(url)
+            return False
+        if not (etag or last_modified):
+            return False
+        if len(body) > self.max_bytes:
+            return False
+        now = time.time()
+        with self._lock:
+            if self._total is None:
+                self._total = self._size()
+            replaced = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (url, etag, last_modified, final_url, encoding, headers, body, size, stored, accessed, vary)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, final_url or url, encoding,
+                 json.dumps(dict(headers)), body, len(body), now, now,
+                 json.dumps(vary_values(dict.fromkeys(vary), request_headers or {})))
+            )
+            self._total += len(body) - (replaced[0] if replaced else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+        return True
+
+    def delete(self, url):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self._conn.commit()
+
+    def touch(self, url):
+        with self._lock:
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total = 0
+
+    def _size(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self):
+        # Caller holds the lock
+        total = self._total = self._size()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT url, size FROM responses ORDER BY accessed ASC").fetchall()
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            total -= size
+        self._total = total
+
+def vary_values(names, request_headers):
+    """{header: value} of the request headers named in a response's Vary"""
+    request_headers = CaseInsensitiveDict(request_headers)
+    return {name: request_headers.get(name) for name in names}
+
+def _cached_response(entry, response):
+    """Builds a full response from a cache entry after a 304 Not Modified"""
+    cached = requests.Response()
+    cached.status_code = 200
+    cached._content = entry['body']
+    cached.encoding = entry['encoding']
+    cached.url = entry['final_url'] or response.url
+    cached.headers = CaseInsensitiveDict(entry['headers'])
+    cached.request = response.request
+    cached.elapsed = response.elapsed
+    return cached
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Returns the process-wide ResponseCache, or None if disabled or unavailable"""
+    global _response_cache
+    if not cache_enabled('http'):
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            try:
+                _response_cache = ResponseCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"HTTP cache unavailable: {e}")
+                return None
+        return _response_cache
+
+# --- SHARED HTTP SESSION ---
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    Process-wide requests.Session, so concurrent scrapes reuse one connection pool.
+    Cookies are never stored, which keeps requests independent like plain requests.get().
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=int(os.getenv('LEADSTOOL_HTTP_POOL_HOSTS', '64')),
+                pool_maxsize=int(os.getenv('LEADSTOOL_HTTP_POOL_SIZE', '16'))
+            )
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+# --- CONDITIONAL GET ---
+
+def conditional_get(url, headers=None, timeout=10, allow_redirects=True, cache=None, metrics=None, stream=False):
+    """
+    requests.get() that revalidates against the response cache.
+    Sends If-None-Match / If-Modified-Since when a cached copy exists and
+    reuses the cached body on 304. Returned responses have a `from_cache` flag.
+    With stream=True the body of a fresh 200 is not read (or cached) here;
+    call store_response() after reading it.
+    """
+    cache = cache if cache is not None else get_response_cache()
+    if cache is None:
+        response = get_session().get(url, headers=headers, timeout=timeout, allow_redirects=allow_redirects, stream=stream)
+        response.from_cache = False
+        return response
+
+    # The headers the session will actually send, for matching Vary
+    sent = requests.sessions.merge_setting(headers, get_session().headers, dict_class=CaseInsensitiveDict)
+    entry = cache.get(url, sent)
+    request_headers = dict(headers or {})
+    if entry:
+        if entry['etag']:
+            request_headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            request_headers['If-Modified-Since'] = entry['last_modified']
+
+    response = get_session().get(url, headers=request_headers, timeout=timeout, allow_redirects=allow_redirects, stream=stream)
+
+    if response.status_code == 304 and entry:
+        cache.touch(url)
+        if metrics:
+            metrics.incr('http_cache_revalidated')
+        cached = _cached_response(entry, response)
+        cached.from_cache = True
+        return cached
+
+    response.from_cache = False
+    if not stream:
+        store_response(url, response, cache=cache, metrics=metrics)
+    return response
+
+def store_response(url, response, cache=None, metrics=None):
+    """Caches a 200 response whose body has been read"""
+    cache = cache if cache is not None else get_response_cache()
+    if cache is None or response.from_cache:
+        return
+    if response.status_code == 200 and cache.put(url, response) and metrics:
+        metrics.incr('http_cache_stored')
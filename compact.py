@@ -0,0 +1,106 @@
+"""
+Compact response format for the API
+Leads are sent as column arrays, with repetitive text columns dictionary-encoded,
+and the JSON is gzip / brotli compressed when the client accepts it
+"""
+import base64
+import gzip
+import json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+# --- COLUMNAR ENCODING ---
+
+def encode_columns(rows):
+    """
+    Turns a list of dicts into {'columns': [...], 'count': n, 'data': {column: values}}.
+    A text column whose values repeat (at most half of them distinct) is sent as
+    {'dict': [distinct values], 'codes': [index per row]}; other columns as plain arrays.
+    Keys missing from a row become null.
+    """
+    columns = []
+    for row in rows:
+        for key in row:
+            if key not in columns:
+                columns.append(key)
+
+    data = {}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        if values and all(isinstance(value, str) for value in values) and len(set(values)) * 2 <= len(values):
+            index = {}
+            codes = [index.setdefault(value, len(index)) for value in values]
+            data[column] = {'dict': list(index), 'codes': codes}
+        else:
+            data[column] = values
+    return {'columns': columns, 'count': len(rows), 'data': data}
+
+def decode_columns(encoded):
+    """Inverse of encode_columns (the decoder in index.html does the same)"""
+    columns = encoded['columns']
+    data = {}
+    for column in columns:
+        values = encoded['data'][column]
+        if isinstance(values, dict):
+            values = [values['dict'][code] for code in values['codes']]
+        data[column] = values
+    return [{column: data[column][i] for column in columns} for i in range(encoded['count'])]
+
+# --- COMPRESSION ---
+
+def request_header(request, name):
+    """Reads a header from a Vercel request (dict or object), case-insensitively"""
+    headers = request.get('headers') if isinstance(request, dict) else getattr(request, 'headers', None)
+    for key, value in dict(headers or {}).items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+def negotiate_encoding(accept_encoding):
+    """Picks 'br' (if brotli is installed) or 'gzip' from an Accept-Encoding header, else None"""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        token, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(token.strip().lower())
+    if brotli and ('br' in accepted or '*' in accepted):
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body)
+    return gzip.compress(body, compresslevel=6)
+
+def json_response(payload, accept_encoding=None, status=200):
+    """
+    Serverless response dict for `payload`, compressed for the client when
+    `accept_encoding` allows it (the body is then base64 encoded for the platform)
+    """
+    body = json.dumps(payload, separators=(',', ':'))
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Vary': 'Accept-Encoding'
+    }
+    encoding = negotiate_encoding(accept_encoding)
+    raw = body.encode('utf-8')
+    if not encoding or len(raw) < MIN_COMPRESS_BYTES:
+        return {'statusCode': status, 'headers': headers, 'body': body}
+
+    headers['Content-Encoding'] = encoding
+    return {
+        'statusCode': status,
+        'headers': headers,
+        'body': base64.b64encode(compress(raw, encoding)).decode('ascii'),
+        'isBase64Encoded': True
+    }
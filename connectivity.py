@@ -0,0 +1,243 @@
+"""
+Fast-fail connectivity checks for vetting business websites
+Separate DNS / connect / read budgets, concurrent DNS pre-resolution and a
+persistent negative cache of sites (scheme, host and port) that recently failed
+"""
+import asyncio
+import os
+import re
+import socket
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import urllib3.util.connection
+
+from cache import get_ttl_cache
+from metrics import Metrics, host_of
+
+# --- CONFIGURATION ---
+
+DNS_TIMEOUT = float(os.getenv('LEADSTOOL_DNS_TIMEOUT', '2'))
+# How long check() waits for a lookup that is still queued behind others for a resolver thread
+DNS_QUEUE_TIMEOUT = float(os.getenv('LEADSTOOL_DNS_QUEUE_TIMEOUT', '5'))
+CONNECT_TIMEOUT = float(os.getenv('LEADSTOOL_CONNECT_TIMEOUT', '3'))
+READ_TIMEOUT = float(os.getenv('LEADSTOOL_READ_TIMEOUT', '10'))
+DEAD_DOMAIN_TTL = float(os.getenv('LEADSTOOL_DEAD_DOMAIN_TTL_HOURS', '24')) * 3600
+
+# How long pre-resolved addresses are used for connecting
+RESOLVED_TTL = 300
+
+# Text seen on registrar / parking pages
+PARKED_MARKERS = [
+    r'this domain (?:name )?(?:is|may be) for sale',
+    r'buy this domain',
+    r'domain is parked',
+    r'parked free, courtesy of',
+    r'sedoparking\.com',
+    r'parkingcrew\.net',
+    r'bodis\.com',
+]
+_PARKED_RE = re.compile('|'.join(PARKED_MARKERS))
+
+# Shared pool for getaddrinfo calls - lookups that hang past the budget are simply not waited for
+_resolver_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix='dns')
+
+def is_parked(html_content):
+    """True if lowercased HTML looks like a parked / for-sale domain page"""
+    return bool(_PARKED_RE.search(html_content[:20000]))
+
+def origin_of(url):
+    """scheme://host:port of a URL (default ports filled in), or None"""
+    try:
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    if not parts.hostname:
+        return None
+    scheme = (parts.scheme or 'http').lower()
+    return f"{scheme}://{parts.hostname}:{port or (443 if scheme == 'https' else 80)}"
+
+# --- PRE-RESOLVED CONNECTIONS ---
+# urllib3 resolves a host again when it connects, with no timeout of its own.
+# Connections to hosts whose prefetch lookup succeeded go straight to those addresses instead.
+
+_resolved = {}
+_resolved_lock = threading.Lock()
+
+def _getaddrinfo(host, lookup):
+    lookup['started'] = time.monotonic()
+    return socket.getaddrinfo(host, None, 0, socket.SOCK_STREAM)
+
+def _remember(host, future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    addresses = list(dict.fromkeys(info[4][0] for info in future.result()))
+    with _resolved_lock:
+        _resolved[host] = (time.monotonic() + RESOLVED_TTL, addresses)
+
+def resolved_addresses(host):
+    """IP addresses from a recent successful lookup of `host`, or None"""
+    with _resolved_lock:
+        entry = _resolved.get(host)
+        if entry and entry[0] < time.monotonic():
+            del _resolved[host]
+            entry = None
+    return entry[1] if entry else None
+
+_create_connection = urllib3.util.connection.create_connection
+
+def _create_preresolved_connection(address, *args, **kwargs):
+    host, port = address
+    addresses = resolved_addresses(host)
+    if not addresses:
+        return _create_connection(address, *args, **kwargs)
+    error = None
+    for ip in addresses:
+        try:
+            # The TLS layer still uses the host name for SNI and certificate checks
+            return _create_connection((ip, port), *args, **kwargs)
+        except OSError as e:
+            error = e
+    raise error
+
+urllib3.util.connection.create_connection = _create_preresolved_connection
+
+# --- CONNECTIVITY ---
+
+class Connectivity:
+    """
+    Decides quickly whether a site is worth fetching.
+    prefetch() starts DNS lookups in the background as soon as URLs are known;
+    check() gives each lookup dns_timeout from when it starts running (waiting
+    at most queue_timeout for a free resolver thread) and consults the dead-site
+    cache. Only lookups that ran for the whole budget mark a site dead.
+    Fetches through requests connect to the addresses found by these lookups for
+    RESOLVED_TTL seconds, so they don't resolve the name a second time without a
+    budget; aiohttp resolves again, within its connect timeout.
+    Dead sites are keyed by scheme, host and port, so a failure on one port does
+    not rule out the others.
+    """
+
+    def __init__(self, metrics=None, dns_timeout=DNS_TIMEOUT, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, dead_ttl=DEAD_DOMAIN_TTL, queue_timeout=DNS_QUEUE_TIMEOUT):
+        self.metrics = metrics or Metrics()
+        self.dns_timeout = dns_timeout
+        self.queue_timeout = queue_timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.dead_ttl = dead_ttl
+        self.dead_domains = get_ttl_cache('dead_domains', dead_ttl)
+        self._lookups = {}
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self):
+        """(connect, read) tuple for requests"""
+        return (self.connect_timeout, self.read_timeout)
+
+    def prefetch(self, urls):
+        """Starts DNS resolution for the hosts of `urls` (a URL or an iterable of URLs)"""
+        if isinstance(urls, str):
+            urls = [urls]
+        for url in urls:
+            host = host_of(url) if url and url != 'N/A' else None
+            if host:
+                self._lookup(host)
+
+    def _lookup(self, host):
+        with self._lock:
+            future = self._lookups.get(host)
+            if future is None:
+                lookup = {'started': None}
+                future = _resolver_pool.submit(_getaddrinfo, host, lookup)
+                future.lookup = lookup
+                future.add_done_callback(lambda done: _remember(host, done))
+                self._lookups[host] = future
+            return future
+
+    def _known_dead(self, url):
+        if self.dead_domains and self.dead_domains.get(origin_of(url)) is not None:
+            self.metrics.incr('dead_domain_cache_hits')
+            return True
+        return False
+
+    def _wait_left(self, future, waiting_since):
+        """Seconds still worth waiting on a lookup - dns_timeout from when it started running"""
+        started = future.lookup['started']
+        now = time.monotonic()
+        if started is None:
+            return min(waiting_since + self.queue_timeout - now, self.dns_timeout)
+        return started + self.dns_timeout - now
+
+    def _timed_out(self, url, future):
+        """A lookup still pending when the wait ended; only a full budget of our own lookup counts against the site"""
+        started = future.lookup['started']
+        if started is not None and time.monotonic() - started >= self.dns_timeout:
+            self.mark_dead(url, 'dns_timeout')
+        else:
+            self.metrics.incr('dns_queue_timeout')
+        return False, 'dns_timeout'
+
+    def check(self, url):
+        """Returns (ok, reason); reason is None when the site is worth fetching"""
+        host = host_of(url)
+        if not host:
+            return False, 'invalid_url'
+        if self._known_dead(url):
+            return False, 'recently_failed'
+        with self.metrics.span('dns_resolve', url):
+            future = self._lookup(host)
+            waiting_since = time.monotonic()
+            try:
+                while True:
+                    left = self._wait_left(future, waiting_since)
+                    if left <= 0:
+                        return self._timed_out(url, future)
+                    try:
+                        future.result(timeout=left)
+                        break
+                    except FutureTimeoutError:
+                        continue
+            except OSError:
+                self.mark_dead(url, 'dns_failed')
+                return False, 'dns_failed'
+        return True, None
+
+    async def check_async(self, url):
+        """check() for asyncio callers - waits on the DNS lookup without blocking the loop"""
+        host = host_of(url)
+        if not host:
+            return False, 'invalid_url'
+        # The dead-site cache is sqlite - read and written on a worker thread
+        if await asyncio.to_thread(self._known_dead, url):
+            return False, 'recently_failed'
+        with self.metrics.span('dns_resolve', url):
+            future = self._lookup(host)
+            waiter = asyncio.wrap_future(future)
+            waiting_since = time.monotonic()
+            try:
+                while True:
+                    left = self._wait_left(future, waiting_since)
+                    if left <= 0:
+                        return await asyncio.to_thread(self._timed_out, url, future)
+                    try:
+                        # shield() keeps a timeout here from cancelling the lookup shared with other callers
+                        await asyncio.wait_for(asyncio.shield(waiter), left)
+                        break
+                    except asyncio.TimeoutError:
+                        continue
+            except OSError:
+                await asyncio.to_thread(self.mark_dead, url, 'dns_failed')
+                return False, 'dns_failed'
+        return True, None
+
+    def mark_dead(self, url, reason):
+        """Remembers that the URL's site (scheme, host and port) failed so later runs skip it"""
+        origin = origin_of(url)
+        if not origin:
+            return
+        self.metrics.incr(f"dead_domain_{reason}")
+        if self.dead_domains:
+            self.dead_domains.put(origin, {'reason': reason})
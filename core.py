@@ -4,105 +4,244 @@ This is used by API functions to avoid importing heavy Streamlit
 """
 import requests
 from bs4 import BeautifulSoup
+import codecs
 import time
 import random
 import re
 import os
 import json
+import threading
 import urllib.parse
+from concurrent.futures import Future
+
+from cache import conditional_get, store_response
+from connectivity import Connectivity, is_parked
+from deadline import DeadlineExceeded
+from memory import BodySlot, body_slot, bounded, release_soup
+from metrics import Metrics, global_metrics, host_of
+from parse_pool import get_parse_executor
+from pipeline import DEFAULT_QUEUE_SIZE, Pipeline, build_stages
+from ratelimit import host_limiter
+from rules import BodyScan, current_rules
+from places import has_cached_details, place_details, text_search
 
 # --- CONFIGURATION & HELPERS ---
 
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Tiered vetting reads page bodies in chunks of this size and stops once the tier is settled
+READ_CHUNK = 16 * 1024
+
+def body_decoder(encoding):
+    """Incremental decoder for a streamed body (UTF-8 if the charset is missing or unknown)"""
+    try:
+        return codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
 def random_sleep(min_seconds=1, max_seconds=3):
     time.sleep(random.uniform(min_seconds, max_seconds))
 
-def fetch_with_retry(url, max_retries=3):
-    """Fetch URL with retry logic"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-    }
+def fetch_with_retry(url, max_retries=3, metrics=None, stage='fetch', deadline=None, slot=None):
+    """
+    Fetch URL with retry logic, timing each attempt under `stage`.
+    Pages are revalidated against the on-disk response cache.
+    With a `deadline`, timeouts are cut to the time left and no retry is started
+    that could not finish in time (DeadlineExceeded is raised instead).
+    Requests to rate limited hosts (ratelimit.HOST_INTERVALS) wait for their turn.
+    A memory.BodySlot `slot` is taken for each download only, and is still held
+    when the page is returned.
+    """
+    metrics = metrics or Metrics()
+    headers = BROWSER_HEADERS
+    limiter = host_limiter(host_of(url))
     
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
+            if limiter:
+                with metrics.span('rate_limit_wait', url):
+                    limiter.wait()
+            if slot and not slot.acquire(deadline.budget() if deadline else None):
+                raise DeadlineExceeded(url)
+            with metrics.span(stage, url):
+                response = conditional_get(url, headers=headers, timeout=deadline.clamp(30) if deadline else 30, metrics=metrics)
+                response.raise_for_status()
             return response.text
+        except DeadlineExceeded:
+            raise
         except Exception as e:
+            if slot:
+                # No body is kept from a failed attempt
+                slot.release()
             if attempt < max_retries - 1:
-                random_sleep(2, 5)
+                backoff = random.uniform(2, 5)
+                if deadline:
+                    deadline.check(backoff)
+                metrics.incr(f"{stage}_retries")
+                with metrics.span('retry_backoff', url):
+                    time.sleep(backoff)
                 continue
+            if deadline and deadline.expired:
+                raise DeadlineExceeded(url) from e
             raise e
     return None
 
 # --- VETTING ENGINE ---
 
 class VettingEngine:
-    def __init__(self):
+    def __init__(self, metrics=None, connectivity=None, mode=None, tiers=None, deadline=None, rules=None):
+        """
+        mode 'full' always downloads the body; 'tiered' scores headers first, only
+        downloads the body if it could still move the score across one of `tiers`, and
+        stops reading it as soon as the tier is settled. `tiers` defaults to the
+        score thresholds of the rules' budget tiers.
+        With a `deadline`, fetches are cut short and raise DeadlineExceeded when time runs out.
+        `rules` pins a rules.RuleSet; by default the rule file is used and reloaded when it changes.
+        Results are remembered per URL and rules version, so one engine shared by several searches vets each site once.
+        """
+        self.metrics = metrics or Metrics()
+        self.connectivity = connectivity or Connectivity(metrics=self.metrics)
+        self.mode = mode or os.getenv('LEADSTOOL_VETTING_MODE', 'full')
+        self.tiers = tiers
+        self.deadline = deadline
+        self.rules = rules
+        self._results = {}
+        self._results_lock = threading.Lock()
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         }
 
+    def active_rules(self):
+        """The RuleSet to score the next site with"""
+        return self.rules or current_rules()
+
+    def prefetch(self, urls):
+        """Starts resolving the domains of sites that will be vetted soon"""
+        self.connectivity.prefetch(urls)
+
     def analyze_site(self, url):
         """
         Scrapes the website HTML to find 'Wealth Markers'.
         Returns a score and details.
+        Dead, DNS-failing or recently failed domains are rejected without a full timeout.
         """
-        score = 0
-        details = []
-        budget_potential = "Unknown"
-        
-        # Tags to look for
-        wealth_markers = {
-            'ads': [r'facebook\.com/tr', r'linkedin\.com/insight', r'adsbygoogle', r'google-analytics', r'googletagmanager'],
-            'tech': [r'shopify', r'hubspot', r'salesforce', r'magento', r'woocommerce'],
-            'keywords': [r'industrial', r'corporate', r'wholesale', r'enterprise', r'luxury', r'manufacturer', r'distributor']
-        }
-        
-        low_budget_markers = [r'wix\.com', r'blogspot\.com', r'wordpress\.com', r'weebly\.com']
+        return self.vet_site(url)[:3]
+
+    def vet_site(self, url):
+        """analyze_site plus the version of the rules the site was scored with"""
+        rules = self.active_rules()
+        key = (rules.version, url.strip().rstrip('/').lower())
+        with self._results_lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+        if not owner:
+            # Already vetted (or being vetted) for another listing
+            self.metrics.incr('vet_shared_hits')
+            return future.result()
 
         try:
-            response = requests.get(url, headers=self.headers, timeout=10, allow_redirects=True)
-            html_content = response.text.lower()
+            result = self._analyze_site(url, rules) + (rules.version,)
+        except BaseException as e:
+            with self._results_lock:
+                del self._results[key]
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result
+
+    def _analyze_site(self, url, rules):
+        ok, reason = self.connectivity.check(url)
+        if not ok:
+            self.metrics.incr('vet_unreachable')
+            return 0, ["Failed to access site"], "Unreachable"
+
+        # The body slot is held until scoring is done and the page text can be freed
+        with body_slot():
+            return self._fetch_and_score(url, rules, self.mode == 'tiered')
+
+    def _fetch_and_score(self, url, rules, tiered):
+        header_found = None
+        timeout = self.deadline.clamp(self.connectivity.timeout) if self.deadline else self.connectivity.timeout
+        try:
+            with self.metrics.span('vet_fetch', url):
+                response = conditional_get(url, headers=self.headers, timeout=timeout, allow_redirects=True, metrics=self.metrics, stream=tiered)
+                if tiered:
+                    history = [r.url for r in response.history] + [response.url]
+                    header_found = rules.header_findings(response.headers, history)
+                    if not response.from_cache and not rules.needs_body(header_found, response.headers.get('Content-Type'), self.tiers):
+                        # Headers already decide the tier - don't download the page
+                        response.close()
+                        self.metrics.incr('vet_body_skipped')
+                        score, details = rules.score(None, header_found)
+                        details.append("Header Check Only")
+                        return rules.result(score, details)
+                    if not response.from_cache:
+                        scan = self._read_until_settled(response, rules, header_found)
+                        if scan:
+                            # The rest of the page can't change the tier
+                            self.metrics.incr('vet_body_partial')
+                            score, details = scan.score()
+                            details.append("Partial Read")
+                            return rules.result(score, details)
+                html_content = response.text.lower()
+                if tiered:
+                    store_response(url, response, metrics=self.metrics)
+                # Only the lowercased copy is needed from here on
+                response = None
+        except requests.ConnectionError as e:
+            self._raise_if_out_of_time(url, e)
+            # Refused / reset / connect timeout - skip this domain on the next runs too
+            self.connectivity.mark_dead(url, 'connect_failed')
+            self.metrics.incr('vet_unreachable')
+            return 0, ["Failed to access site"], "Unreachable"
         except Exception as e:
+            self._raise_if_out_of_time(url, e)
+            self.metrics.incr('vet_unreachable')
             return 0, ["Failed to access site"], "Unreachable"
 
-        # Check Ads
-        found_ads = [marker for marker in wealth_markers['ads'] if re.search(marker, html_content)]
-        if found_ads:
-            score += 40
-            details.append(f"Ads Detected ({len(found_ads)})")
-
-        # Check Tech
-        found_tech = [marker for marker in wealth_markers['tech'] if re.search(marker, html_content)]
-        if found_tech:
-            score += 30
-            details.append(f"Premium Tech ({len(found_tech)})")
-        
-        # Check Keywords
-        found_kws = [kw for kw in wealth_markers['keywords'] if kw in html_content]
-        if found_kws:
-            score += 20
-            details.append(f"High-Ticket Keywords ({len(found_kws)})")
-
-        # Check Low Budget
-        if any(re.search(lb, html_content) for lb in low_budget_markers):
-            score -= 10
-            details.append("Free/Page-Builder Detected")
-
-        # Determine Budget Potential
-        if score >= 50:
-            budget_potential = "High (Target Met)"
-        elif score >= 20:
-            budget_potential = "Medium"
-        else:
-            budget_potential = "Low"
+        if is_parked(html_content):
+            self.connectivity.mark_dead(url, 'parked')
 
-        return score, ", ".join(details), budget_potential
+        return self.score_site(html_content, url, header_found, rules)
+
+    def _read_until_settled(self, response, rules, header_found):
+        """
+        Reads a streamed body chunk by chunk, scoring as it goes. Returns the BodyScan
+        if reading stopped early, or None once the whole body is read (it is then
+        available as response.content, for full scoring and the cache).
+        """
+        scan = BodyScan(rules, header_found)
+        decoder = body_decoder(response.encoding)
+        chunks = []
+        for chunk in response.iter_content(READ_CHUNK):
+            chunks.append(chunk)
+            scan.feed(decoder.decode(chunk).lower())
+            if scan.settled(self.tiers):
+                response.close()
+                return scan
+        response._content = b''.join(chunks)
+        return None
+
+    def _raise_if_out_of_time(self, url, error):
+        """A fetch cut short by the deadline says nothing about the site"""
+        if self.deadline and self.deadline.expired:
+            raise DeadlineExceeded(url) from error
+
+    def score_site(self, html_content, url=None, header_found=None, rules=None):
+        """Scores already-downloaded, lowercased HTML; returns (score, details, budget)"""
+        rules = rules or self.active_rules()
+        with self.metrics.span('vet_score', url):
+            score, details = rules.score(html_content, header_found)
+        return rules.result(score, details)
 
 # --- SCRAPER LOGIC ---
 
@@ -184,9 +323,18 @@ def parse_google_maps_data(html_content, max_results):
     
     # Method 4: Look for text content that might be business names
     # This is a fallback - look for text that appears to be business listings
-    text_content = soup.get_text()
     # Look for patterns like "Business Name - Address" or similar
-    potential_names = re.findall(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*(?:\s+[&\-])?[A-Za-z\s]+)', text_content)
+    name_pattern = r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*(?:\s+[&\-])?[A-Za-z\s]+)'
+    if bounded():
+        # Scan text nodes one at a time instead of building the whole page's text
+        potential_names = []
+        for text in soup.strings:
+            potential_names.extend(re.findall(name_pattern, text))
+            if len(potential_names) >= max_results:
+                break
+    else:
+        potential_names = re.findall(name_pattern, soup.get_text())
+    release_soup(soup)
     for name in potential_names[:max_results]:
         name = name.strip()
         if len(name) > 3 and len(name) < 100:
@@ -211,17 +359,227 @@ def parse_google_maps_data(html_content, max_results):
     
     return unique_listings
 
-def run_google_maps_scraper(keyword, search_location, latitude, longitude, zoom_level, max_results, progress_bar, status_text, reviews_threshold, vetting_threshold):
-    """Main scraper function - tries to work without API, but results may be limited"""
+def parse_place_details(place_html):
+    """
+    Extracts phone, website, rating, review count and claimed status from a place page.
+    Missing fields are returned as None.
+    """
+    place_soup = BeautifulSoup(place_html, 'html.parser')
+    details = {'phone': None, 'website': None, 'rating': None, 'reviews': None, 'claimed': None}
+    
+    # Extract phone
+    phone_elem = place_soup.find('button', attrs={'data-item-id': re.compile(r'phone:')})
+    if phone_elem:
+        details['phone'] = phone_elem.get('aria-label', 'N/A').replace('Phone: ', '').strip()
+    
+    # Extract website
+    website_elem = place_soup.find('a', attrs={'data-item-id': 'authority'})
+    if website_elem:
+        details['website'] = website_elem.get('href', 'N/A')
+    
+    # Extract rating and reviews
+    rating_elem = place_soup.find('span', attrs={'role': 'img', 'aria-label': re.compile(r'stars')})
+    if rating_elem:
+        details['rating'] = rating_elem.get('aria-label', '0').split(' ')[0]
+    
+    reviews_elem = place_soup.find('button', attrs={'aria-label': re.compile(r'reviews')})
+    if reviews_elem:
+        reviews_text = reviews_elem.get('aria-label', '0')
+        reviews_match = re.search(r'(\d+)', reviews_text.replace(',', ''))
+        if reviews_match:
+            details['reviews'] = int(reviews_match.group(1))
+    
+    # A "Claim this business" button means the listing is unclaimed
+    claimed_elem = place_soup.find('button', attrs={'data-item-id': 'merchant'})
+    details['claimed'] = "Unclaimed" if claimed_elem else "Claimed"
+    release_soup(place_soup)
+    
+    return details
+
+# --- PIPELINE STAGES ---
+
+def enrich_listing(listing, metrics, parser=None, deadline=None):
+    """
+    Detail enrichment: fills phone/website/rating/reviews from the place page if needed.
+    `parser` is an optional parse_pool.ParseExecutor to parse outside this thread.
+    """
+    record = {
+        'name': listing.get('name', 'Unknown'),
+        'phone': listing.get('phone', 'N/A'),
+        'website': listing.get('website', 'N/A'),
+        'rating': listing.get('rating', '0'),
+        'reviews': listing.get('reviews', 0),
+    }
+    
+    # If we have a place URL, try to get more details
+    if listing.get('url') and record['website'] == 'N/A':
+        place_url = f"https://www.google.com{listing['url']}" if listing['url'].startswith('/') else listing['url']
+        try:
+            place_details = None
+            with BodySlot() as slot:
+                place_html = fetch_with_retry(place_url, metrics=metrics, stage='place_fetch', deadline=deadline, slot=slot)
+                if place_html:
+                    with metrics.span('place_parse', place_url):
+                        place_details = parser.parse_place(place_html) if parser else parse_place_details(place_html)
+                place_html = None
+            
+            if place_details:
+                if record['phone'] == 'N/A' and place_details['phone']:
+                    record['phone'] = place_details['phone']
+                if record['website'] == 'N/A' and place_details['website']:
+                    record['website'] = place_details['website']
+                if place_details['rating']:
+                    record['rating'] = place_details['rating']
+                if place_details['reviews'] is not None:
+                    record['reviews'] = place_details['reviews']
+        except DeadlineExceeded:
+            raise
+        except:
+            pass
+    
+    return record
+
+def vet_record(record, vetter):
+    """Vetting: scores the record's website, if it has one"""
+    record['vetting_score'] = 0
+    record['vetting_details'] = ""
+    record['rules_version'] = ""
+    if record['website'] != "N/A":
+        record['vetting_score'], record['vetting_details'], _, record['rules_version'] = vetter.vet_site(record['website'])
+    return record
+
+def classify_lead(record, reviews_threshold, vetting_threshold):
+    """Lead classification: turns an enriched, vetted record into the output row"""
+    website = record['website']
+    reviews_count = record['reviews']
+    vetting_score = record.get('vetting_score', 0)
+    
+    # Determine claimed status (heuristic) unless the source knows it
+    is_claimed = record.get('claimed') or ("Claimed" if website != "N/A" or reviews_count > 0 else "Unclaimed")
+    
+    # Lead filtering
+    lead_status = "Standard"
+    if reviews_count < reviews_threshold or is_claimed == "Unclaimed":
+        lead_status = "High Priority New Lead"
+    
+    budget = "N/A"
+    if website != "N/A":
+        if vetting_score >= vetting_threshold:
+            budget = "High (Target Met)"
+        elif vetting_score >= (vetting_threshold / 2):
+            budget = "Medium"
+        else:
+            budget = "Low"
+    
+    return {
+        "Name": record['name'],
+        "Phone": record['phone'],
+        "Website": website,
+        "Reviews": reviews_count,
+        "Rating": record['rating'],
+        "Status": is_claimed,
+        "Lead Type": lead_status,
+        "Vetting Score": vetting_score,
+        "Markers": record.get('vetting_details', ""),
+        "Est. Budget": budget,
+        "Rules Version": record.get('rules_version', "")
+    }
+
+def listing_cost(item):
+    """
+    Rough number of requests still needed to finish a listing or Places result,
+    used to schedule cheap work first when a run has a deadline
+    """
+    if item.get('website', 'N/A') != 'N/A':
+        return 1
+    if item.get('url'):
+        # HTML listing (its place_id is only the URL slug): place page fetch, paced
+        # for Google, then maybe a site to vet
+        return 3
+    if item.get('place_id'):
+        # Places API result: a details call unless cached, then probably a site to vet
+        return 1 if has_cached_details(item['place_id']) else 2
+    return 0
+
+def finish_partial(pipeline, deadline):
+    """Records listings the pipeline did not get to before the deadline"""
+    if deadline and pipeline.unfinished:
+        deadline.cut(item.get('name', 'Unknown') for item in pipeline.unfinished)
+
+def reclassify_lead(lead, reviews_threshold, vetting_threshold):
+    """Re-applies classify_lead to a finished lead, e.g. when the thresholds change on cached results"""
+    record = {
+        'name': lead['Name'],
+        'phone': lead['Phone'],
+        'website': lead['Website'],
+        'rating': lead['Rating'],
+        'reviews': lead['Reviews'],
+        'claimed': lead['Status'],
+        'vetting_score': lead['Vetting Score'],
+        'vetting_details': lead['Markers'],
+        'rules_version': lead.get('Rules Version', ""),
+    }
+    return dict(lead, **classify_lead(record, reviews_threshold, vetting_threshold))
+
+def lead_pipeline(enrich, vetter, reviews_threshold, vetting_threshold, metrics, concurrency=None, queue_size=DEFAULT_QUEUE_SIZE):
+    """Builds the enrich -> vet -> classify pipeline shared by all scraper implementations"""
+    def enrich_and_resolve(item):
+        record = enrich(item)
+        # Resolve the site's domain while the record waits in the vet queue
+        vetter.prefetch(record['website'])
+        return record
+    
+    stages = build_stages([
+        ('enrich', enrich_and_resolve),
+        ('vet', lambda record: vet_record(record, vetter)),
+        ('classify', lambda record: classify_lead(record, reviews_threshold, vetting_threshold)),
+    ], concurrency)
+    return Pipeline(stages, queue_size=queue_size, metrics=metrics, deadline=vetter.deadline)
+
+def progress_reporter(total, progress_bar, status_text, on_lead=None):
+    """
+    Returns an on_result callback that advances the progress bar per finished lead
+    and passes the lead to `on_lead`, if given
+    """
+    progress_step = 1.0 / total if total else 0
+    state = {'progress': 0.0}
+    
+    def on_result(lead):
+        state['progress'] += progress_step
+        if progress_bar:
+            progress_bar.progress(min(state['progress'], 1.0))
+        if status_text:
+            status_text.text(f"Processed: {lead['Name']}")
+        if on_lead:
+            on_lead(lead)
+    
+    return on_result
+
+# --- SCRAPERS ---
+
+def run_google_maps_scraper(keyword, search_location, latitude, longitude, zoom_level, max_results, progress_bar, status_text, reviews_threshold, vetting_threshold, metrics=None, concurrency=None, queue_size=DEFAULT_QUEUE_SIZE, parse_workers=None, vetting_mode=None, deadline=None, vetter=None, on_lead=None):
+    """
+    Main scraper function - tries to work without API, but results may be limited.
+    Pass a Metrics object to collect per-stage timings for the run.
+    `concurrency` maps pipeline stage names ('enrich', 'vet', 'classify') to worker counts.
+    `parse_workers` > 0 parses HTML in a process pool (default: LEADSTOOL_PARSE_WORKERS).
+    `vetting_mode` 'tiered' vets from response headers first (default: LEADSTOOL_VETTING_MODE).
+    With a deadline.Deadline, cheap listings are processed first and the run returns
+    what it finished in time; the deadline records whether the result is partial.
+    Pass a `vetter` to share one VettingEngine (and its results) between searches.
+    `on_lead(lead)` is called on the calling thread as each lead is finished.
+    """
     leads = []
-    vetter = VettingEngine()
+    metrics = metrics or Metrics()
+    vetter = vetter or VettingEngine(metrics=metrics, mode=vetting_mode, tiers=(vetting_threshold, vetting_threshold / 2), deadline=deadline)
+    parser = get_parse_executor(parse_workers)
     
     try:
         places_api_key = os.getenv('GOOGLE_MAPS_API_KEY', '')
         
         # If Google Maps Places API is available, use it (most reliable)
         if places_api_key:
-            return fetch_from_places_api(keyword, latitude, longitude, max_results, reviews_threshold, vetting_threshold, vetter, status_text, progress_bar)
+            return fetch_from_places_api(keyword, latitude, longitude, max_results, reviews_threshold, vetting_threshold, vetter, status_text, progress_bar, metrics=metrics, concurrency=concurrency, queue_size=queue_size, deadline=deadline, on_lead=on_lead)
         
         query = f"{keyword} in {search_location}"
         if status_text:
@@ -235,213 +593,99 @@ def run_google_maps_scraper(keyword, search_location, latitude, longitude, zoom_
         if status_text:
             status_text.text("Fetching Google Maps data (results may be limited without JavaScript rendering)...")
         
-        html_content = fetch_with_retry(url)
-        
-        if not html_content:
+        with BodySlot() as slot:
+            html_content = fetch_with_retry(url, metrics=metrics, stage='search_fetch', deadline=deadline, slot=slot)
+            
+            if not html_content:
+                if status_text:
+                    status_text.text("Failed to fetch Google Maps. The page may be blocking requests.")
+                return []
+            
+            # Parse the HTML - try to extract whatever data is available
             if status_text:
-                status_text.text("Failed to fetch Google Maps. The page may be blocking requests.")
-            return []
-        
-        # Parse the HTML - try to extract whatever data is available
-        if status_text:
-            status_text.text("Parsing results from HTML (may be limited without JavaScript rendering)...")
-        parsed_listings = parse_google_maps_data(html_content, max_results)
+                status_text.text("Parsing results from HTML (may be limited without JavaScript rendering)...")
+            with metrics.span('search_parse', url):
+                parsed_listings = parser.parse_listings(html_content, max_results)
+            html_content = None
+        vetter.prefetch(listing.get('website') for listing in parsed_listings)
         
         if not parsed_listings:
             if status_text:
                 status_text.text("No listings found. Google Maps loads content with JavaScript. Consider using Google Maps Places API for reliable results.")
             return []
         
-        progress_step = 1.0 / len(parsed_listings) if parsed_listings else 0
-        current_progress = 0.0
-        
-        for i, listing in enumerate(parsed_listings):
-            try:
-                name = listing.get('name', 'Unknown')
-                
-                # Try to get more details by fetching the place page
-                phone = listing.get('phone', 'N/A')
-                website = listing.get('website', 'N/A')
-                rating = listing.get('rating', '0')
-                reviews_count = listing.get('reviews', 0)
-                
-                # If we have a place URL, try to get more details
-                if listing.get('url') and website == 'N/A':
-                    place_url = f"https://www.google.com{listing['url']}" if listing['url'].startswith('/') else listing['url']
-                    try:
-                        place_html = fetch_with_retry(place_url)
-                        if place_html:
-                            place_soup = BeautifulSoup(place_html, 'html.parser')
-                            
-                            # Extract phone
-                            if phone == 'N/A':
-                                phone_elem = place_soup.find('button', attrs={'data-item-id': re.compile(r'phone:')})
-                                if phone_elem:
-                                    phone = phone_elem.get('aria-label', 'N/A').replace('Phone: ', '').strip()
-                            
-                            # Extract website
-                            if website == 'N/A':
-                                website_elem = place_soup.find('a', attrs={'data-item-id': 'authority'})
-                                if website_elem:
-                                    website = website_elem.get('href', 'N/A')
-                            
-                            # Extract rating and reviews
-                            rating_elem = place_soup.find('span', attrs={'role': 'img', 'aria-label': re.compile(r'stars')})
-                            if rating_elem:
-                                rating = rating_elem.get('aria-label', '0').split(' ')[0]
-                            
-                            reviews_elem = place_soup.find('button', attrs={'aria-label': re.compile(r'reviews')})
-                            if reviews_elem:
-                                reviews_text = reviews_elem.get('aria-label', '0')
-                                reviews_match = re.search(r'(\d+)', reviews_text.replace(',', ''))
-                                if reviews_match:
-                                    reviews_count = int(reviews_match.group(1))
-                    except:
-                        pass
-                
-                # Determine claimed status (heuristic)
-                is_claimed = "Claimed" if website != "N/A" or reviews_count > 0 else "Unclaimed"
-                
-                # Lead filtering
-                lead_status = "Standard"
-                if reviews_count < reviews_threshold or is_claimed == "Unclaimed":
-                    lead_status = "High Priority New Lead"
-                
-                # Vetting
-                vetting_score = 0
-                vetting_details = ""
-                budget = "N/A"
-                
-                if website != "N/A":
-                    vetting_score, vetting_details, _ = vetter.analyze_site(website)
-                    
-                    if vetting_score >= vetting_threshold:
-                        budget = "High (Target Met)"
-                    elif vetting_score >= (vetting_threshold / 2):
-                        budget = "Medium"
-                    else:
-                        budget = "Low"
-                
-                lead = {
-                    "Name": name,
-                    "Phone": phone,
-                    "Website": website,
-                    "Reviews": reviews_count,
-                    "Rating": rating,
-                    "Status": is_claimed,
-                    "Lead Type": lead_status,
-                    "Vetting Score": vetting_score,
-                    "Markers": vetting_details,
-                    "Est. Budget": budget
-                }
-                leads.append(lead)
-                
-                current_progress += progress_step
-                if progress_bar:
-                    progress_bar.progress(min(current_progress, 1.0))
-                if status_text:
-                    status_text.text(f"Processed: {name}")
-                
-            except Exception as e:
-                print(f"Error processing listing {i}: {e}")
-                continue
+        pipeline = lead_pipeline(
+            lambda listing: enrich_listing(listing, metrics, parser, deadline),
+            vetter, reviews_threshold, vetting_threshold, metrics,
+            concurrency=concurrency, queue_size=queue_size
+        )
+        leads = pipeline.run(parsed_listings, on_result=progress_reporter(len(parsed_listings), progress_bar, status_text, on_lead),
+                             order=listing_cost if deadline else None)
+        finish_partial(pipeline, deadline)
         
+    except DeadlineExceeded:
+        # Ran out of time before any listing was found
+        deadline.cut()
     except Exception as e:
         print(f"Critical Scraper Error: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        global_metrics.merge(metrics)
     
     return leads
 
-def fetch_from_places_api(keyword, latitude, longitude, max_results, reviews_threshold, vetting_threshold, vetter, status_text, progress_bar):
+def enrich_place(place, api_key, metrics, deadline=None):
+    """Detail enrichment for the Places API: fetches phone and website for a text search result"""
+    record = {
+        'name': place.get('name', 'Unknown'),
+        'rating': str(place.get('rating', 0)),
+        'reviews': place.get('user_ratings_total', 0),
+        'phone': 'N/A',
+        'website': 'N/A',
+    }
+    
+    # Get place details for phone and website
+    place_id = place.get('place_id')
+    if place_id:
+        details_data = place_details(place_id, api_key, metrics=metrics, timeout=deadline.clamp(10) if deadline else 10)
+        if details_data.get('status') == 'OK':
+            result = details_data.get('result', {})
+            record['phone'] = result.get('formatted_phone_number', 'N/A')
+            record['website'] = result.get('website', 'N/A')
+    
+    return record
+
+def fetch_from_places_api(keyword, latitude, longitude, max_results, reviews_threshold, vetting_threshold, vetter, status_text, progress_bar, metrics=None, concurrency=None, queue_size=DEFAULT_QUEUE_SIZE, deadline=None, on_lead=None):
     """Fallback: Use Google Maps Places API"""
+    metrics = metrics or vetter.metrics
     api_key = os.getenv('GOOGLE_MAPS_API_KEY', '')
     if not api_key:
         return []
     
     try:
-        # Use Places API Text Search
-        url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-        params = {
-            'query': keyword,
-            'location': f"{latitude},{longitude}",
-            'radius': 5000,
-            'key': api_key
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
+        # Use Places API Text Search (cached per keyword / area)
+        data = text_search(keyword, latitude, longitude, api_key, metrics=metrics, timeout=deadline.clamp(10) if deadline else 10)
         
         if data.get('status') != 'OK':
             return []
         
-        leads = []
         places = data.get('results', [])[:max_results]
-        progress_step = 1.0 / len(places) if places else 0
-        current_progress = 0.0
-        
-        for place in places:
-            name = place.get('name', 'Unknown')
-            rating = str(place.get('rating', 0))
-            reviews_count = place.get('user_ratings_total', 0)
-            phone = 'N/A'
-            website = 'N/A'
-            
-            # Get place details for phone and website
-            place_id = place.get('place_id')
-            if place_id:
-                details_url = "https://maps.googleapis.com/maps/api/place/details/json"
-                details_params = {
-                    'place_id': place_id,
-                    'fields': 'formatted_phone_number,website',
-                    'key': api_key
-                }
-                details_response = requests.get(details_url, params=details_params, timeout=10)
-                details_data = details_response.json()
-                if details_data.get('status') == 'OK':
-                    result = details_data.get('result', {})
-                    phone = result.get('formatted_phone_number', 'N/A')
-                    website = result.get('website', 'N/A')
-            
-            is_claimed = "Claimed" if website != "N/A" or reviews_count > 0 else "Unclaimed"
-            lead_status = "Standard"
-            if reviews_count < reviews_threshold or is_claimed == "Unclaimed":
-                lead_status = "High Priority New Lead"
-            
-            vetting_score = 0
-            vetting_details = ""
-            budget = "N/A"
-            
-            if website != "N/A":
-                vetting_score, vetting_details, _ = vetter.analyze_site(website)
-                if vetting_score >= vetting_threshold:
-                    budget = "High (Target Met)"
-                elif vetting_score >= (vetting_threshold / 2):
-                    budget = "Medium"
-                else:
-                    budget = "Low"
-            
-            lead = {
-                "Name": name,
-                "Phone": phone,
-                "Website": website,
-                "Reviews": reviews_count,
-                "Rating": rating,
-                "Status": is_claimed,
-                "Lead Type": lead_status,
-                "Vetting Score": vetting_score,
-                "Markers": vetting_details,
-                "Est. Budget": budget
-            }
-            leads.append(lead)
-            
-            current_progress += progress_step
-            if progress_bar:
-                progress_bar.progress(min(current_progress, 1.0))
-            if status_text:
-                status_text.text(f"Processed: {name}")
         
+        pipeline = lead_pipeline(
+            lambda place: enrich_place(place, api_key, metrics, deadline),
+            vetter, reviews_threshold, vetting_threshold, metrics,
+            concurrency=concurrency, queue_size=queue_size
+        )
+        leads = pipeline.run(places, on_result=progress_reporter(len(places), progress_bar, status_text, on_lead),
+                             order=listing_cost if deadline else None)
+        finish_partial(pipeline, deadline)
         return leads
+    except DeadlineExceeded:
+        deadline.cut()
+        return []
     except Exception as e:
         print(f"Places API Error: {e}")
+        if deadline and deadline.expired:
+            deadline.cut()
         return []
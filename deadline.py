@@ -0,0 +1,67 @@
+"""
+Time budgets for scrape runs
+A Deadline is passed down the scraper, fetch and vet paths so a run stops
+starting new work, cuts slow fetches short and still returns what it finished
+"""
+import os
+import threading
+import time
+
+# Time kept back from a request's limit for building and sending the response
+RESPONSE_MARGIN = float(os.getenv('LEADSTOOL_DEADLINE_MARGIN', '1.5'))
+
+# Don't start a fetch with less time than this left
+MIN_FETCH_TIME = 0.5
+
+class DeadlineExceeded(Exception):
+    """Raised when there is not enough time left to start or finish a step"""
+
+class Deadline:
+    """
+    A point in time by which a run must finish. seconds=None means no limit.
+    Work that was cut short is recorded with cut(), so callers can report
+    `partial` results and the listings that were never processed.
+    """
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+        self.partial = False
+        self.unprocessed = []
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        """Seconds left (infinite without a limit)"""
+        if self.expires_at is None:
+            return float('inf')
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def budget(self):
+        """Seconds left, or None without a limit - for APIs that take an optional timeout"""
+        return None if self.expires_at is None else self.remaining()
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self, needed=0):
+        """Raises DeadlineExceeded unless more than `needed` seconds are left"""
+        if self.remaining() <= needed:
+            raise DeadlineExceeded(f"less than {needed:.1f}s left")
+
+    def clamp(self, timeout):
+        """
+        Shrinks a requests-style timeout (seconds or a (connect, read) tuple) to the
+        time left, so a slow fetch is cut off at the deadline instead of running past it
+        """
+        self.check(MIN_FETCH_TIME)
+        left = self.remaining()
+        if isinstance(timeout, tuple):
+            return tuple(min(part, left) for part in timeout)
+        return min(timeout, left)
+
+    def cut(self, names=()):
+        """Marks the run as partial and records the names of listings it did not finish"""
+        with self._lock:
+            self.partial = True
+            self.unprocessed.extend(names)
@@ -0,0 +1,69 @@
+"""
+Server-side geocoding through Nominatim
+Lookups are cached on disk and rate limited to Nominatim's 1 request/second policy.
+Both are shared by the processes of one machine, not across serverless instances.
+"""
+import re
+
+import requests
+
+from cache import get_ttl_cache
+from metrics import Metrics
+from ratelimit import SharedRateLimiter
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+USER_AGENT = "maps_scraper_app_v1"
+
+# Found locations rarely move; misses expire sooner so new map data gets picked up
+FOUND_TTL = 30 * 24 * 3600
+NOT_FOUND_TTL = 24 * 3600
+
+_limiter = SharedRateLimiter('nominatim', 1.0)
+
+def normalize_query(query):
+    """Normalizes a location string so equivalent spellings share a cache entry"""
+    query = query.strip().lower()
+    query = re.sub(r'\s+', ' ', query)
+    query = re.sub(r'\s*,\s*', ', ', query)
+    return query.strip(' ,.')
+
+def geocode(query, metrics=None):
+    """
+    Returns {'lat', 'lon', 'address'} for a location string, or None if not found.
+    Raises on network / HTTP errors (those are not cached).
+    """
+    metrics = metrics or Metrics()
+    key = normalize_query(query)
+    if not key:
+        return None
+
+    cache = get_ttl_cache('geocode', FOUND_TTL)
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.incr('geocode_cache_hits')
+            return cached['location']
+
+    with metrics.span('geocode_wait', NOMINATIM_URL):
+        _limiter.wait()
+    with metrics.span('geocode', NOMINATIM_URL):
+        response = requests.get(
+            NOMINATIM_URL,
+            params={'format': 'json', 'q': key, 'limit': 1},
+            headers={'User-Agent': USER_AGENT},
+            timeout=10
+        )
+        response.raise_for_status()
+        data = response.json()
+
+    location = None
+    if data:
+        location = {
+            'lat': float(data[0]['lat']),
+            'lon': float(data[0]['lon']),
+            'address': data[0].get('display_name', query)
+        }
+
+    if cache:
+        cache.put(key, {'location': location}, ttl=FOUND_TTL if location else NOT_FOUND_TTL)
+    return location
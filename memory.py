@@ -0,0 +1,200 @@
+"""
+Memory-bounded mode and per-run memory reporting
+LEADSTOOL_MEMORY_BOUNDED=1 frees parse trees as soon as their fields are read and
+caps how many page bodies are held at once; MemoryProfiler reports peak RSS and
+the largest Python allocations of a run
+"""
+import asyncio
+import contextlib
+import os
+import sys
+import threading
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MAX_INFLIGHT_BODIES = int(os.getenv('LEADSTOOL_MAX_INFLIGHT_BODIES', '4'))
+TOP_ALLOCATIONS = 10
+
+def bounded():
+    """True when memory-bounded mode is on (LEADSTOOL_MEMORY_BOUNDED)"""
+    return os.getenv('LEADSTOOL_MEMORY_BOUNDED', '0').lower() in ('1', 'true', 'yes', 'on')
+
+# --- BODY SLOTS ---
+
+_body_slots = threading.BoundedSemaphore(max(1, MAX_INFLIGHT_BODIES))
+
+@contextlib.contextmanager
+def body_slot():
+    """
+    Held while a page body is downloaded and processed. In memory-bounded mode at
+    most MAX_INFLIGHT_BODIES bodies are alive at once across all threads of the process.
+    """
+    if not bounded():
+        yield
+        return
+    with _body_slots:
+        yield
+
+class BodySlot:
+    """
+    A body_slot() that is only taken when acquire() is called - right before the
+    download - so rate-limit waits and retry backoffs don't hold one.
+    Use as `with BodySlot() as slot:`; the slot is released on exit.
+    """
+
+    def __init__(self):
+        self.held = False
+
+    def acquire(self, timeout=None):
+        """Takes the slot (no-op outside memory-bounded mode); returns False on timeout"""
+        if self.held or not bounded():
+            return True
+        if timeout is None:
+            self.held = _body_slots.acquire()
+        else:
+            self.held = _body_slots.acquire(timeout=timeout)
+        return self.held
+
+    def release(self):
+        if self.held:
+            self.held = False
+            _body_slots.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+class AsyncBodySlot:
+    """BodySlot counterpart for one of async_body_slots()"""
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.held = False
+
+    async def acquire(self):
+        if self.slots is not None and not self.held:
+            await self.slots.acquire()
+            self.held = True
+
+    def release(self):
+        if self.held:
+            self.held = False
+            self.slots.release()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+def async_body_slots():
+    """Per event loop counterpart of _body_slots for AsyncBodySlot: an asyncio.Semaphore, or None when not bounded"""
+    if not bounded():
+        return None
+    return asyncio.Semaphore(max(1, MAX_INFLIGHT_BODIES))
+
+def release_soup(soup):
+    """Breaks up a BeautifulSoup tree in memory-bounded mode so it is freed now, not at the next GC"""
+    if bounded():
+        soup.decompose()
+
+# --- REPORTING ---
+
+def current_rss():
+    """Resident set size of this process in bytes (0 if unknown)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def max_rss():
+    """Peak RSS of the process since it started, in bytes (0 if unknown)"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+_tracing_lock = threading.Lock()
+_tracing_users = [0]
+
+class MemoryProfiler:
+    """
+    Context manager that measures a run: RSS sampled in the background (peak and
+    start/end) and tracemalloc's peak and top allocation sites.
+    tracemalloc is process-wide, so runs profiled at the same time see each other's allocations.
+    """
+
+    def __init__(self, interval=0.05, top=TOP_ALLOCATIONS, trace=True):
+        self.interval = interval
+        self.top = top
+        self.trace = trace
+        self._stop = threading.Event()
+        self._sampler = None
+        self.rss_start = self.rss_end = self.rss_peak = 0
+        self.traced_peak = 0
+        self.top_allocations = []
+
+    def __enter__(self):
+        self.rss_start = self.rss_peak = current_rss()
+        if self.trace:
+            with _tracing_lock:
+                if _tracing_users[0] == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                else:
+                    tracemalloc.reset_peak()
+                _tracing_users[0] += 1
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._sampler.join()
+        self.rss_end = current_rss()
+        self.rss_peak = max(self.rss_peak, self.rss_end)
+        if self.trace:
+            _, self.traced_peak = tracemalloc.get_traced_memory()
+            stats = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            ]).statistics('lineno')
+            self.top_allocations = [
+                {
+                    'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                    'size_kb': round(stat.size / 1024, 1),
+                    'count': stat.count,
+                }
+                for stat in stats[:self.top]
+            ]
+            with _tracing_lock:
+                _tracing_users[0] -= 1
+                if _tracing_users[0] == 0:
+                    tracemalloc.stop()
+        return False
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.rss_peak = max(self.rss_peak, current_rss())
+
+    def summary(self):
+        """JSON-serializable report (sizes in MB)"""
+        mb = lambda value: round(value / (1024 * 1024), 2)
+        return {
+            'bounded_mode': bounded(),
+            'peak_rss_mb': mb(self.rss_peak),
+            'start_rss_mb': mb(self.rss_start),
+            'end_rss_mb': mb(self.rss_end),
+            'process_peak_rss_mb': mb(max_rss()),
+            'traced_peak_mb': mb(self.traced_peak),
+            'top_allocations': self.top_allocations,
+        }
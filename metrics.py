@@ -0,0 +1,199 @@
+"""
+Span-style timing and counters for the scraping and vetting stages
+Kept dependency-free so it can be used by core, app and the API functions
+"""
+import json
+import os
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+
+# Hosts the process-wide aggregate keeps apart besides the busiest sites (the rest are summed under OTHER_HOST)
+GLOBAL_MAX_HOSTS = int(os.getenv('LEADSTOOL_METRICS_MAX_HOSTS', '50'))
+PINNED_DOMAINS = ('google.com', 'googleapis.com', 'openstreetmap.org')
+OTHER_HOST = 'other'
+
+# --- HELPERS ---
+
+def host_of(url):
+    """Returns the hostname of a URL, or None if it can't be determined"""
+    if not url:
+        return None
+    try:
+        return urllib.parse.urlparse(url).hostname
+    except ValueError:
+        return None
+
+def _pinned(host):
+    return any(host == domain or host.endswith('.' + domain) for domain in PINNED_DOMAINS)
+
+def _new_stat():
+    return {'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0}
+
+def _add_stat(stat, seconds, error):
+    stat['count'] += 1
+    stat['total'] += seconds
+    stat['max'] = max(stat['max'], seconds)
+    if error:
+        stat['errors'] += 1
+
+def _format_stat(stat):
+    return {
+        'count': stat['count'],
+        'errors': stat['errors'],
+        'total_seconds': round(stat['total'], 4),
+        'avg_seconds': round(stat['total'] / stat['count'], 4) if stat['count'] else 0.0,
+        'max_seconds': round(stat['max'], 4),
+    }
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# --- METRICS ---
+
+class Metrics:
+    """
+    Collects per-stage timings (with a per-host breakdown) and simple counters.
+    Safe to share between threads.
+    With `max_hosts`, only Google / API hosts and the `max_hosts` busiest other
+    hosts are broken down; the rest are summed under OTHER_HOST.
+    """
+
+    def __init__(self, max_hosts=None):
+        self.max_hosts = max_hosts
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._hosts = {}
+        self._counters = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def span(self, stage, url=None):
+        """Times the enclosed block and records it under `stage` (and the URL's host)"""
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - start, host=host_of(url), error=error)
+
+    def record(self, stage, seconds, host=None, error=False):
+        with self._lock:
+            _add_stat(self._stages.setdefault(stage, _new_stat()), seconds, error)
+            if host:
+                new = (stage, host) not in self._hosts
+                _add_stat(self._hosts.setdefault((stage, host), _new_stat()), seconds, error)
+                if new:
+                    self._trim_hosts()
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def merge(self, other):
+        """Adds another Metrics object's data into this one"""
+        with other._lock:
+            stages = {k: dict(v) for k, v in other._stages.items()}
+            hosts = {k: dict(v) for k, v in other._hosts.items()}
+            counters = dict(other._counters)
+        with self._lock:
+            for target, source in ((self._stages, stages), (self._hosts, hosts)):
+                for key, stat in source.items():
+                    current = target.setdefault(key, _new_stat())
+                    current['count'] += stat['count']
+                    current['errors'] += stat['errors']
+                    current['total'] += stat['total']
+                    current['max'] = max(current['max'], stat['max'])
+            for name, value in counters.items():
+                self._counters[name] = self._counters.get(name, 0) + value
+            self._trim_hosts()
+
+    def _trim_hosts(self):
+        # Caller holds the lock
+        if self.max_hosts is None:
+            return
+        calls = {}
+        for (stage, host), stat in self._hosts.items():
+            if host != OTHER_HOST and not _pinned(host):
+                calls[host] = calls.get(host, 0) + stat['count']
+        if len(calls) <= self.max_hosts:
+            return
+        kept = set(sorted(calls, key=calls.get, reverse=True)[:self.max_hosts])
+        for (stage, host) in list(self._hosts):
+            if host in calls and host not in kept:
+                stat = self._hosts.pop((stage, host))
+                other = self._hosts.setdefault((stage, OTHER_HOST), _new_stat())
+                other['count'] += stat['count']
+                other['errors'] += stat['errors']
+                other['total'] += stat['total']
+                other['max'] = max(other['max'], stat['max'])
+
+    def summary(self):
+        """Returns the aggregated metrics as a JSON-serializable dict"""
+        with self._lock:
+            stages = {}
+            for stage, stat in self._stages.items():
+                stages[stage] = _format_stat(stat)
+                stages[stage]['hosts'] = {}
+            for (stage, host), stat in self._hosts.items():
+                stages[stage]['hosts'][host] = _format_stat(stat)
+            return {
+                'elapsed_seconds': round(time.perf_counter() - self.started, 4),
+                'stages': stages,
+                'counters': dict(self._counters),
+            }
+
+    def to_json(self):
+        return json.dumps(self.summary())
+
+    def to_prometheus(self, prefix='leadstool'):
+        """Renders the metrics in the Prometheus text exposition format"""
+        with self._lock:
+            stages = {k: dict(v) for k, v in self._stages.items()}
+            hosts = {k: dict(v) for k, v in self._hosts.items()}
+            counters = dict(self._counters)
+
+        lines = [
+            f"# HELP {prefix}_stage_seconds_total Time spent in each stage",
+            f"# TYPE {prefix}_stage_seconds_total counter",
+        ]
+        for stage, stat in sorted(stages.items()):
+            lines.append(f'{prefix}_stage_seconds_total{{stage="{_escape_label(stage)}"}} {stat["total"]:.6f}')
+        lines += [
+            f"# HELP {prefix}_stage_calls_total Number of times each stage ran",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        for stage, stat in sorted(stages.items()):
+            lines.append(f'{prefix}_stage_calls_total{{stage="{_escape_label(stage)}"}} {stat["count"]}')
+        lines += [
+            f"# HELP {prefix}_stage_errors_total Number of failed runs of each stage",
+            f"# TYPE {prefix}_stage_errors_total counter",
+        ]
+        for stage, stat in sorted(stages.items()):
+            lines.append(f'{prefix}_stage_errors_total{{stage="{_escape_label(stage)}"}} {stat["errors"]}')
+        lines += [
+            f"# HELP {prefix}_host_seconds_total Time spent per stage and host",
+            f"# TYPE {prefix}_host_seconds_total counter",
+        ]
+        for (stage, host), stat in sorted(hosts.items()):
+            labels = f'stage="{_escape_label(stage)}",host="{_escape_label(host)}"'
+            lines.append(f'{prefix}_host_seconds_total{{{labels}}} {stat["total"]:.6f}')
+        lines += [
+            f"# HELP {prefix}_host_calls_total Number of calls per stage and host",
+            f"# TYPE {prefix}_host_calls_total counter",
+        ]
+        for (stage, host), stat in sorted(hosts.items()):
+            labels = f'stage="{_escape_label(stage)}",host="{_escape_label(host)}"'
+            lines.append(f'{prefix}_host_calls_total{{{labels}}} {stat["count"]}')
+        for name, value in sorted(counters.items()):
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+# Process-wide aggregate that every finished run is merged into - per-run Metrics keep every host
+global_metrics = Metrics(max_hosts=GLOBAL_MAX_HOSTS)
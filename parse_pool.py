@@ -0,0 +1,97 @@
+"""
+Optional process pool for CPU-bound HTML parsing
+Workers take raw HTML bytes and return only the small extracted structures,
+so BeautifulSoup runs on other cores instead of holding the fetch threads' GIL
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+# --- WORKER FUNCTIONS ---
+# core is imported inside the workers to avoid a circular import with core.py
+
+def _to_bytes(html):
+    return html.encode('utf-8') if isinstance(html, str) else html
+
+def extract_listings(html_bytes, max_results):
+    """Search page -> list of listing dicts"""
+    from core import parse_google_maps_data
+    return parse_google_maps_data(html_bytes.decode('utf-8', errors='replace'), max_results)
+
+def extract_place(html_bytes):
+    """Place page -> phone / website / rating / reviews / claimed"""
+    from core import parse_place_details
+    return parse_place_details(html_bytes.decode('utf-8', errors='replace'))
+
+def _ready():
+    return True
+
+# --- EXECUTOR ---
+
+def pool_context():
+    """
+    Start method for the pool. Forking while pipeline, DNS or batch threads hold
+    locks can deadlock the child, so workers come from a forkserver (spawn on Windows).
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+class ParseExecutor:
+    """
+    Runs the extract_* functions in a process pool, or inline when workers is 0.
+    All methods are safe to call from several threads.
+    The worker processes are started when the executor is created.
+    """
+
+    def __init__(self, workers=0):
+        self.workers = max(0, int(workers))
+        self._pool = None
+        if self.workers:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=pool_context())
+            for future in [self._pool.submit(_ready) for _ in range(self.workers)]:
+                future.result()
+
+    def submit(self, fn, *args):
+        """Returns a concurrent.futures.Future for fn(*args)"""
+        if self._pool:
+            return self._pool.submit(fn, *args)
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    async def run_async(self, fn, *args):
+        """Awaitable version of submit - inline work goes to a thread so the event loop stays free"""
+        if self._pool:
+            return await asyncio.wrap_future(self._pool.submit(fn, *args))
+        return await asyncio.to_thread(fn, *args)
+
+    def parse_listings(self, html, max_results):
+        return self.submit(extract_listings, _to_bytes(html), max_results).result()
+
+    def parse_place(self, html):
+        return self.submit(extract_place, _to_bytes(html)).result()
+
+    def shutdown(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+def get_parse_executor(workers=None):
+    """
+    Returns a shared ParseExecutor. `workers` defaults to LEADSTOOL_PARSE_WORKERS
+    (0 = parse inline in the calling thread, the default).
+    """
+    if workers is None:
+        workers = int(os.getenv('LEADSTOOL_PARSE_WORKERS', '0'))
+    workers = max(0, int(workers))
+    with _executors_lock:
+        if workers not in _executors:
+            _executors[workers] = ParseExecutor(workers)
+        return _executors[workers]
@@ -0,0 +1,250 @@
+"""
+Staged pipeline with bounded queues between stages
+Each stage runs in its own pool of worker threads so network-bound stages overlap
+"""
+import queue
+import threading
+import traceback
+
+from deadline import DeadlineExceeded
+
+# Default worker threads per stage - enrichment talks to Google so it stays low
+DEFAULT_CONCURRENCY = {
+    'enrich': 2,
+    'vet': 8,
+    'classify': 1,
+}
+DEFAULT_QUEUE_SIZE = 10
+
+# How often blocked workers check whether the run was stopped
+POLL_INTERVAL = 0.1
+
+_DONE = object()
+
+class Stage:
+    """A pipeline step: `func(item)` returns the item for the next stage, or None to drop it"""
+
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+
+class Pipeline:
+    """
+    Runs items from a source iterable through a list of Stages.
+    Queues between stages are bounded, so at most about
+    queue_size + workers items are in flight per stage.
+    The source is iterated and `on_result` is called on the calling thread,
+    which keeps single-threaded objects (Playwright pages, Streamlit) safe.
+    With a `deadline`, run() returns when it passes, with every item that got
+    through and the items the last stage had already received (it is expected to
+    be cheap, like classification); source items that did not make it are left in `.unfinished`.
+    Worker threads always exit when run() returns or raises, e.g. if `on_result` does.
+    """
+
+    def __init__(self, stages, queue_size=DEFAULT_QUEUE_SIZE, metrics=None, deadline=None):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.metrics = metrics
+        self.deadline = deadline
+        self.errors = []
+        self.unfinished = []
+        self._errors_lock = threading.Lock()
+        self._settled = set()
+
+    def _budget(self):
+        return self.deadline.budget() if self.deadline else None
+
+    def _expired(self):
+        return bool(self.deadline) and self.deadline.expired
+
+    def run(self, source, on_result=None, order=None):
+        """
+        Returns the results of the last stage, in source order.
+        `order` is an optional sort key (e.g. estimated cost) for the order items are started in.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        results = queue.Queue()
+        queues.append(results)
+        stop = threading.Event()
+
+        threads = []
+        last_threads = []
+        for index, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            remaining_lock = threading.Lock()
+            for _ in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(stage, queues[index], queues[index + 1], remaining, remaining_lock, stop, index == len(self.stages) - 1),
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+                if index == len(self.stages) - 1:
+                    last_threads.append(thread)
+
+        collected = []
+        pulled = {}
+        finished = False
+        if order is not None:
+            entries = iter(sorted(enumerate(source), key=lambda entry: order(entry[1])))
+        else:
+            entries = enumerate(source)
+
+        def drain(block):
+            while True:
+                try:
+                    entry = results.get(block=block, timeout=self._budget() if block else None)
+                except queue.Empty:
+                    return False
+                if entry is _DONE:
+                    return True
+                collected.append(entry)
+                if on_result:
+                    on_result(entry[1])
+
+        try:
+            while True:
+                try:
+                    seq, item = next(entries)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    # Keep whatever was already discovered flowing through the later stages
+                    self._record_error(Stage('source', None), e)
+                    break
+                if self.deadline:
+                    # Only kept to report unfinished items - otherwise items are freed once processed
+                    pulled[seq] = item
+                if self._expired():
+                    break
+                try:
+                    queues[0].put((seq, item), timeout=self._budget())
+                except queue.Full:
+                    break
+                # on_result errors propagate to the caller (the finally below stops the workers)
+                drain(block=False)
+            if self.deadline and (order is not None or isinstance(source, (list, tuple))):
+                # Items never pulled from a list are unfinished too
+                pulled.update(entries)
+
+            if not self._expired():
+                # Gives up at the deadline if the first stage is still backed up
+                if all(self._put(queues[0], _DONE, stop) for _ in range(self.stages[0].workers)):
+                    while not finished and not self._expired():
+                        finished = drain(block=True)
+            if finished:
+                for thread in threads:
+                    thread.join()
+        finally:
+            # Workers still waiting on a queue or a full outbox exit instead of blocking forever
+            stop.set()
+
+        if not finished:
+            # Out of time: finish what already reached the last stage, and keep everything it produced
+            self._run_inline(self.stages[-1], queues[-2], results)
+            for thread in last_threads:
+                thread.join(POLL_INTERVAL)
+            drain(block=False)
+
+        collected.sort(key=lambda entry: entry[0])
+        done = {seq for seq, _ in collected} | self._settled
+        self.unfinished = [pulled[seq] for seq in sorted(pulled) if seq not in done]
+        return [item for _, item in collected]
+
+    def _run_inline(self, stage, inbox, outbox):
+        """Runs the items left in a stage's inbox on the calling thread"""
+        while True:
+            try:
+                entry = inbox.get_nowait()
+            except queue.Empty:
+                return
+            if entry is _DONE:
+                continue
+            seq, item = entry
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                self._record_error(stage, e)
+                self._settle(seq)
+                continue
+            if result is not None:
+                outbox.put((seq, result))
+            else:
+                self._settle(seq)
+
+    def _put(self, target, entry, stop):
+        """Blocking put that gives up once the run is stopped or out of time; returns True if put"""
+        while not stop.is_set() and not self._expired():
+            try:
+                target.put(entry, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source, stop):
+        """Blocking get that returns _DONE once the run is stopped"""
+        while not stop.is_set():
+            try:
+                return source.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _worker(self, stage, inbox, outbox, remaining, remaining_lock, stop, is_last=False):
+        while True:
+            entry = self._get(inbox, stop)
+            if entry is _DONE:
+                break
+            seq, item = entry
+            if self._expired() and not is_last:
+                # Out of time - leave the item unfinished (the last stage still finishes its items)
+                continue
+            try:
+                result = stage.func(item)
+            except DeadlineExceeded:
+                continue
+            except Exception as e:
+                if self._expired():
+                    # Most likely a fetch cut short by the deadline
+                    continue
+                self._record_error(stage, e)
+                self._settle(seq)
+                continue
+            if result is not None:
+                if not self._put(outbox, (seq, result), stop):
+                    break
+            else:
+                self._settle(seq)
+
+        # The last worker of a stage tells every worker of the next stage to stop
+        with remaining_lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            next_index = self.stages.index(stage) + 1
+            next_workers = self.stages[next_index].workers if next_index < len(self.stages) else 1
+            for _ in range(next_workers):
+                if not self._put(outbox, _DONE, stop):
+                    break
+
+    def _settle(self, seq):
+        """Marks an item as dropped or failed, so it doesn't count as unfinished"""
+        with self._errors_lock:
+            self._settled.add(seq)
+
+    def _record_error(self, stage, error):
+        print(f"Error in pipeline stage '{stage.name}': {error}")
+        traceback.print_exc()
+        with self._errors_lock:
+            self.errors.append((stage.name, error))
+        if self.metrics:
+            self.metrics.incr(f"pipeline_{stage.name}_errors")
+
+def build_stages(funcs, concurrency=None):
+    """Builds Stages from (name, func) pairs using DEFAULT_CONCURRENCY overridden by `concurrency`"""
+    settings = dict(DEFAULT_CONCURRENCY)
+    settings.update(concurrency or {})
+    return [Stage(name, func, settings.get(name, 1)) for name, func in funcs]
@@ -0,0 +1,117 @@
+"""
+Google Places API calls with an on-disk response cache
+Text searches are keyed by keyword, rounded coordinates and radius, details by place_id,
+so recurring scans of the same territory don't pay for the same calls twice
+"""
+import asyncio
+import os
+import re
+
+from cache import get_session, get_ttl_cache
+from metrics import Metrics
+
+TEXTSEARCH_URL = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+DETAILS_URL = "https://maps.googleapis.com/maps/api/place/details/json"
+
+DEFAULT_RADIUS = 5000
+DETAILS_FIELDS = 'formatted_phone_number,website'
+
+# Search results change as businesses open and close; contact details change rarely
+TEXTSEARCH_TTL = float(os.getenv('LEADSTOOL_PLACES_SEARCH_TTL_HOURS', '24')) * 3600
+DETAILS_TTL = float(os.getenv('LEADSTOOL_PLACES_DETAILS_TTL_HOURS', str(7 * 24))) * 3600
+
+# 3 decimals is about 100 m - nearby map centers share a cache entry
+COORD_PRECISION = 3
+
+# Only answers that describe the data are cached, not quota or key errors
+CACHEABLE_STATUSES = ('OK', 'ZERO_RESULTS', 'NOT_FOUND')
+
+# --- CACHE KEYS ---
+
+def textsearch_key(keyword, latitude, longitude, radius=DEFAULT_RADIUS):
+    keyword = re.sub(r'\s+', ' ', keyword.strip().lower())
+    return f"{keyword}|{round(float(latitude), COORD_PRECISION)}|{round(float(longitude), COORD_PRECISION)}|{int(radius)}"
+
+def details_key(place_id, fields=DETAILS_FIELDS):
+    return f"{place_id}|{fields}"
+
+def _lookup(kind, key, metrics):
+    """Returns the cached API response for `kind` ('textsearch' / 'details'), counting hits and misses"""
+    cache = get_ttl_cache(f"places_{kind}", TEXTSEARCH_TTL if kind == 'textsearch' else DETAILS_TTL)
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.incr(f"places_{kind}_cache_hits")
+            return cached
+    metrics.incr(f"places_{kind}_calls")
+    return None
+
+def _save(kind, key, data):
+    cache = get_ttl_cache(f"places_{kind}", TEXTSEARCH_TTL if kind == 'textsearch' else DETAILS_TTL)
+    if cache and data.get('status') in CACHEABLE_STATUSES:
+        cache.put(key, data)
+
+def _textsearch_params(keyword, latitude, longitude, radius, api_key):
+    return {
+        'query': keyword,
+        'location': f"{latitude},{longitude}",
+        'radius': radius,
+        'key': api_key
+    }
+
+def _details_params(place_id, fields, api_key):
+    return {
+        'place_id': place_id,
+        'fields': fields,
+        'key': api_key
+    }
+
+# --- API CALLS ---
+
+def has_cached_details(place_id, fields=DETAILS_FIELDS):
+    """True if place_details() would be served from the cache (not counted in the metrics)"""
+    cache = get_ttl_cache('places_details', DETAILS_TTL)
+    return bool(cache) and cache.get(details_key(place_id, fields)) is not None
+
+def text_search(keyword, latitude, longitude, api_key, radius=DEFAULT_RADIUS, metrics=None, timeout=10):
+    """Returns the Places text search JSON response, from the cache when possible"""
+    metrics = metrics or Metrics()
+    key = textsearch_key(keyword, latitude, longitude, radius)
+    data = _lookup('textsearch', key, metrics)
+    if data is None:
+        with metrics.span('places_textsearch', TEXTSEARCH_URL):
+            response = get_session().get(TEXTSEARCH_URL, params=_textsearch_params(keyword, latitude, longitude, radius, api_key), timeout=timeout)
+            data = response.json()
+        _save('textsearch', key, data)
+    return data
+
+def place_details(place_id, api_key, fields=DETAILS_FIELDS, metrics=None, timeout=10):
+    """Returns the Places details JSON response for place_id, from the cache when possible"""
+    metrics = metrics or Metrics()
+    key = details_key(place_id, fields)
+    data = _lookup('details', key, metrics)
+    if data is None:
+        with metrics.span('places_details', DETAILS_URL):
+            response = get_session().get(DETAILS_URL, params=_details_params(place_id, fields, api_key), timeout=timeout)
+            data = response.json()
+        _save('details', key, data)
+    return data
+
+async def text_search_async(http, keyword, latitude, longitude, api_key, radius=DEFAULT_RADIUS):
+    """text_search() through an async_engine.AsyncHTTPClient"""
+    key = textsearch_key(keyword, latitude, longitude, radius)
+    data = await asyncio.to_thread(_lookup, 'textsearch', key, http.metrics)
+    if data is None:
+        data = await http.get_json(TEXTSEARCH_URL, params=_textsearch_params(keyword, latitude, longitude, radius, api_key),
+                                   stage='places_textsearch')
+        await asyncio.to_thread(_save, 'textsearch', key, data)
+    return data
+
+async def place_details_async(http, place_id, api_key, fields=DETAILS_FIELDS):
+    """place_details() through an async_engine.AsyncHTTPClient"""
+    key = details_key(place_id, fields)
+    data = await asyncio.to_thread(_lookup, 'details', key, http.metrics)
+    if data is None:
+        data = await http.get_json(DETAILS_URL, params=_details_params(place_id, fields, api_key), stage='places_details')
+        await asyncio.to_thread(_save, 'details', key, data)
+    return data
@@ -0,0 +1,105 @@
+"""
+Rate limiting shared by all threads (or all tasks of an event loop) of the process,
+or by all processes on a machine for SharedRateLimiter
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from cache import default_cache_dir
+
+# Minimum spacing between requests to a host, shared by every scrape running in the process
+HOST_INTERVALS = {
+    'www.google.com': float(os.getenv('LEADSTOOL_GOOGLE_INTERVAL', '0.5')),
+}
+
+class RateLimiter:
+    """Spaces calls at least `min_interval` seconds apart across threads"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_allowed = 0.0
+
+    def wait(self):
+        """Blocks until the next call is allowed; returns the seconds waited"""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._next_allowed - now)
+            self._next_allowed = max(now, self._next_allowed) + self.min_interval
+        if delay:
+            time.sleep(delay)
+        return delay
+
+class SharedRateLimiter:
+    """
+    RateLimiter shared by every process that uses the same cache directory - the
+    next allowed time is kept in a sqlite file there. Separate machines (e.g.
+    serverless instances) each have their own. Falls back to a process-wide
+    limit if the file can't be used.
+    """
+
+    def __init__(self, name, min_interval, path=None):
+        self.name = name
+        self.min_interval = min_interval
+        self.path = path or os.path.join(default_cache_dir(), 'ratelimit.sqlite3')
+        self._fallback = RateLimiter(min_interval)
+
+    def wait(self):
+        """Blocks until the next call is allowed; returns the seconds waited"""
+        try:
+            delay = self._reserve()
+        except sqlite3.Error:
+            return self._fallback.wait()
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def _reserve(self):
+        # Wall-clock time, as it is compared across processes
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS limits (name TEXT PRIMARY KEY, next_allowed REAL)")
+            # Takes the write lock before reading, so two processes can't reserve the same slot
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT next_allowed FROM limits WHERE name = ?", (self.name,)).fetchone()
+            now = time.time()
+            next_allowed = row[0] if row else 0.0
+            conn.execute("INSERT OR REPLACE INTO limits (name, next_allowed) VALUES (?, ?)",
+                         (self.name, max(now, next_allowed) + self.min_interval))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return max(0.0, next_allowed - now)
+
+class AsyncRateLimiter:
+    """asyncio counterpart of RateLimiter - spaces calls from tasks of one event loop"""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_allowed = 0.0
+
+    async def wait(self):
+        """Sleeps until the next call is allowed; returns the seconds waited"""
+        # No await between reading and updating, so tasks can't interleave here
+        now = time.monotonic()
+        delay = max(0.0, self._next_allowed - now)
+        self._next_allowed = max(now, self._next_allowed) + self.min_interval
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+def host_limiter(host):
+    """Returns the process-wide RateLimiter for `host`, or None if it isn't rate limited"""
+    interval = HOST_INTERVALS.get(host)
+    if not interval:
+        return None
+    with _host_limiters_lock:
+        if host not in _host_limiters:
+            _host_limiters[host] = RateLimiter(interval)
+        return _host_limiters[host]
@@ -0,0 +1,274 @@
+"""
+Vetting rules
+The markers, weights and budget tiers used to score websites live in a rule
+file (vetting_rules.json, or TOML). It is validated and compiled once into an
+immutable RuleSet that all vetting engines share, and reloaded when it changes
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+RULES_PATH = os.getenv('LEADSTOOL_VETTING_RULES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vetting_rules.json'))
+
+# How often (seconds) the rule file is checked for changes
+RELOAD_INTERVAL = float(os.getenv('LEADSTOOL_RULES_RELOAD_SECONDS', '5'))
+
+class RuleError(ValueError):
+    """The rule file is missing or invalid"""
+
+Rule = namedtuple('Rule', ['pattern', 'regex', 'weight'])
+
+# body / headers are tuples of Rules; show_count adds "(n markers)" to the detail
+Category = namedtuple('Category', ['name', 'label', 'weight', 'show_count', 'body', 'headers'])
+
+# --- MATCHING ---
+
+class RuleSet:
+    """
+    Compiled rules. A category adds the weight of its strongest matching rule
+    once, whether it matched in the page body or in the response headers.
+    """
+    __slots__ = ('version', 'categories', 'tiers', 'default_tier')
+
+    def __init__(self, version, categories, tiers, default_tier):
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'categories', tuple(categories))
+        object.__setattr__(self, 'tiers', tuple(tiers))
+        object.__setattr__(self, 'default_tier', default_tier)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RuleSet is immutable")
+
+    def header_findings(self, headers, urls):
+        """{category: [patterns]} found in response headers and the redirect chain"""
+        lines = [f"{name}: {value}" for name, value in headers.items()] + [str(u) for u in urls]
+        blob = "\n".join(lines).lower()
+        return {
+            category.name: [rule.pattern for rule in category.headers if rule.regex.search(blob)]
+            for category in self.categories if category.headers
+        }
+
+    def score(self, html_content=None, header_found=None):
+        """
+        Scores lowercased HTML (None = headers only) plus any header findings.
+        Returns (score, details).
+        """
+        scan = BodyScan(self, header_found)
+        if html_content is not None:
+            scan.feed(html_content)
+        return scan.score()
+
+    @property
+    def thresholds(self):
+        """Minimum scores of the budget tiers, highest first"""
+        return tuple(min_score for min_score, _ in self.tiers)
+
+    def needs_body(self, header_found, content_type=None, tiers=None):
+        """True if body markers could still move the header score across one of `tiers` (default: the budget tiers)"""
+        if content_type and 'html' not in content_type.lower():
+            return False
+        return not BodyScan(self, header_found).settled(tiers)
+
+    def _header_rules(self, category, header_found):
+        return [rule for rule in category.headers if rule.pattern in header_found.get(category.name, ())]
+
+    def budget(self, score):
+        """Budget tier label of a score"""
+        for min_score, label in self.tiers:
+            if score >= min_score:
+                return label
+        return self.default_tier
+
+    def result(self, score, details):
+        """The engine's (score, details, budget) tuple"""
+        return score, ", ".join(details), self.budget(score)
+
+    @staticmethod
+    def _strongest(category, rules):
+        weights = [rule.weight for rule in rules]
+        return max(weights) if category.weight > 0 else min(weights)
+
+class BodyScan:
+    """
+    Scores a page while it is read: feed() lowercased text in order, and once
+    settled() the rest of the page can no longer move the score across a tier
+    """
+
+    # Text kept from the previous chunk so markers split across chunks still match
+    OVERLAP = 512
+
+    def __init__(self, rules, header_found=None):
+        self.rules = rules
+        self.header_found = header_found or {}
+        self.matched = {category.name: [] for category in rules.categories}
+        self._tail = ''
+
+    def feed(self, text):
+        window = self._tail + text
+        for category in self.rules.categories:
+            found = self.matched[category.name]
+            for rule in category.body:
+                if rule not in found and rule.regex.search(window):
+                    found.append(rule)
+        self._tail = window[-self.OVERLAP:]
+
+    def bounds(self):
+        """(lowest, highest) score the whole page can still get"""
+        lower = upper = 0
+        for category in self.rules.categories:
+            matched = self.matched[category.name] + self.rules._header_rules(category, self.header_found)
+            unread = [rule for rule in category.body if rule not in self.matched[category.name]]
+            current = RuleSet._strongest(category, matched) if matched else 0
+            best = RuleSet._strongest(category, matched + unread) if matched or unread else 0
+            lower += min(current, best)
+            upper += max(current, best)
+        return lower, upper
+
+    def settled(self, tiers=None):
+        """True if the score's tier under `tiers` (default: the budget tiers) is already decided"""
+        if tiers is None:
+            tiers = self.rules.thresholds
+        lower, upper = self.bounds()
+        tier_index = lambda value: sum(1 for threshold in tiers if value >= threshold)
+        return tier_index(lower) == tier_index(upper)
+
+    def score(self):
+        """(score, details) of what was read so far plus the header findings"""
+        score = 0
+        details = []
+        for category in self.rules.categories:
+            body = self.matched[category.name]
+            headers = self.rules._header_rules(category, self.header_found)
+            if not body and not headers:
+                continue
+            score += RuleSet._strongest(category, body + headers)
+            if category.show_count:
+                details.append(f"{category.label} ({len(body) or len(headers)})")
+            else:
+                details.append(category.label)
+        return score, details
+
+# --- LOADING ---
+
+def _check(condition, where, message):
+    if not condition:
+        raise RuleError(f"{where}: {message}")
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _compile_rules(entries, where, category_weight):
+    _check(isinstance(entries, list), where, "must be a list")
+    rules = []
+    for i, entry in enumerate(entries):
+        at = f"{where}[{i}]"
+        if isinstance(entry, str):
+            entry = {'pattern': entry}
+        _check(isinstance(entry, dict), at, "must be a pattern or {pattern, weight}")
+        _check(set(entry) <= {'pattern', 'weight'}, at, f"unknown keys {sorted(set(entry) - {'pattern', 'weight'})}")
+        pattern = entry.get('pattern')
+        _check(isinstance(pattern, str) and pattern, at, "pattern must be a non-empty string")
+        weight = entry.get('weight', category_weight)
+        _check(_is_number(weight) and weight * category_weight > 0, at, "weight must be a number with the sign of the category weight")
+        try:
+            # Pages and headers are lowercased before matching
+            regex = re.compile(pattern.lower())
+        except re.error as e:
+            raise RuleError(f"{at}: invalid pattern {pattern!r}: {e}")
+        rules.append(Rule(pattern, regex, weight))
+    return rules
+
+def compile_rules(data, source='rules'):
+    """Validates parsed rule data and compiles it into a RuleSet"""
+    _check(isinstance(data, dict), source, "must be an object")
+    _check(set(data) <= {'version', 'tiers', 'default_tier', 'categories'}, source,
+           f"unknown keys {sorted(set(data) - {'version', 'tiers', 'default_tier', 'categories'})}")
+    version = data.get('version')
+    _check(isinstance(version, (str, int)) and not isinstance(version, bool) and str(version), f"{source}.version", "is required")
+
+    tiers = []
+    _check(isinstance(data.get('tiers', []), list), f"{source}.tiers", "must be a list")
+    for i, tier in enumerate(data.get('tiers', [])):
+        at = f"{source}.tiers[{i}]"
+        _check(isinstance(tier, dict) and _is_number(tier.get('min_score')) and isinstance(tier.get('label'), str),
+               at, "must be {min_score, label}")
+        tiers.append((tier['min_score'], tier['label']))
+    tiers.sort(key=lambda tier: tier[0], reverse=True)
+    default_tier = data.get('default_tier', 'Low')
+    _check(isinstance(default_tier, str), f"{source}.default_tier", "must be a string")
+
+    categories = []
+    _check(isinstance(data.get('categories'), dict) and data['categories'], f"{source}.categories", "must be a non-empty object")
+    for name, spec in data['categories'].items():
+        at = f"{source}.categories.{name}"
+        _check(isinstance(spec, dict), at, "must be an object")
+        _check(set(spec) <= {'label', 'weight', 'show_count', 'body', 'headers'}, at,
+               f"unknown keys {sorted(set(spec) - {'label', 'weight', 'show_count', 'body', 'headers'})}")
+        weight = spec.get('weight')
+        _check(_is_number(weight) and weight != 0, f"{at}.weight", "must be a non-zero number")
+        label = spec.get('label', name)
+        _check(isinstance(label, str), f"{at}.label", "must be a string")
+        show_count = spec.get('show_count', True)
+        _check(isinstance(show_count, bool), f"{at}.show_count", "must be true or false")
+        body = _compile_rules(spec.get('body', []), f"{at}.body", weight)
+        headers = _compile_rules(spec.get('headers', []), f"{at}.headers", weight)
+        _check(body or headers, at, "needs at least one body or headers rule")
+        categories.append(Category(name, label, weight, show_count, tuple(body), tuple(headers)))
+
+    # The tag changes with any edit, so results scored with older rules can be told apart
+    digest = hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()[:8]
+    return RuleSet(f"{version}-{digest}", categories, tiers, default_tier)
+
+def load_rules(path=RULES_PATH):
+    """Reads, validates and compiles a JSON or TOML rule file"""
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except OSError as e:
+        raise RuleError(f"{path}: {e}")
+    is_toml = path.lower().endswith('.toml')
+    if is_toml and tomllib is None:
+        raise RuleError(f"{path}: TOML rule files need Python 3.11+")
+    try:
+        data = tomllib.loads(raw.decode('utf-8')) if is_toml else json.loads(raw)
+    except ValueError as e:
+        raise RuleError(f"{path}: {e}")
+    return compile_rules(data, os.path.basename(path))
+
+# --- HOT RELOAD ---
+
+_lock = threading.Lock()
+_loaded = {'rules': None, 'mtime': None, 'checked': 0.0}
+
+def current_rules():
+    """
+    The RuleSet of RULES_PATH, reloaded when the file changes (checked at most
+    every RELOAD_INTERVAL seconds). If an edited file is invalid, the last good
+    rules stay in use.
+    """
+    now = time.monotonic()
+    with _lock:
+        rules = _loaded['rules']
+        if rules is not None and now - _loaded['checked'] < RELOAD_INTERVAL:
+            return rules
+        _loaded['checked'] = now
+        try:
+            mtime = os.stat(RULES_PATH).st_mtime_ns
+            if rules is None or mtime != _loaded['mtime']:
+                # Remembered first, so a broken edit is reported once, not on every check
+                _loaded['mtime'] = mtime
+                rules = _loaded['rules'] = load_rules(RULES_PATH)
+        except (OSError, RuleError) as e:
+            if rules is None:
+                raise RuleError(f"{RULES_PATH}: {e}") if isinstance(e, OSError) else e
+            print(f"Keeping vetting rules {rules.version}: {e}")
+        return rules
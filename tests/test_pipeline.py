@@ -0,0 +1,34 @@
+"""
+Pipeline deadline behaviour
+"""
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deadline import Deadline
+from pipeline import Pipeline, build_stages
+
+def slow_enrich(item):
+    time.sleep(0.3)
+    return item
+
+class DeadlineTest(unittest.TestCase):
+
+    def test_keeps_finished_results_at_deadline(self):
+        stages = build_stages([('enrich', slow_enrich), ('vet', lambda item: item), ('classify', lambda item: item)])
+        pipeline = Pipeline(stages, queue_size=2, deadline=Deadline(0.5))
+        started = time.monotonic()
+        results = pipeline.run(list(range(20)))
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(sorted(results), [0, 1])
+        self.assertEqual(len(pipeline.unfinished), 18)
+
+    def test_runs_everything_without_deadline(self):
+        stages = build_stages([('double', lambda item: item * 2), ('inc', lambda item: item + 1)])
+        self.assertEqual(sorted(Pipeline(stages, queue_size=2).run(range(5))), [1, 3, 5, 7, 9])
+
+if __name__ == '__main__':
+    unittest.main()